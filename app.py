@@ -1,22 +1,437 @@
+import os
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, no_update
 import plotly.graph_objects as go
 import pandas as pd
-import plotly.io as pio
-from heatmap import create_heatmap
+from functools import lru_cache
+from urllib.parse import urlencode
+from flask import abort, request, send_file
+from heatmap import create_heatmap, heatmap_frame, page_count, player_labels, POSITION_ATTRIBUTES
+from figure_cache import FigureCache, data_version
+from figure_store import compress_responses, encode_arrays, load_figure
+from export_cache import FORMATS, ExportCache
+from snapshots import AttributeHistory, latest_snapshots
+from player_index import PlayerIndex
+from similarity import load_indexes
+from scatterplot import REFERENCE_DATE, load_young_players, player_age, points_in_polygon, polygon_path
+from data_store import load_table
+from team_report import SEASONS, build_team_report
+from possession import load_possession_curves, possession_figure
+from ratings import load_ratings, ratings_figure, standings_figure
+from shot_maps import UNKNOWN_SEASON, load_shot_maps, shot_map_figure
+from instrumentation import configure_logging, instrument, register_metrics
 
-# Import data for heatmaps
-df_fw = pd.read_csv('grouped_players/fw_players.csv')
-df_mf = pd.read_csv('grouped_players/mf_players.csv')
-df_bk = pd.read_csv('grouped_players/bk_players.csv')
+configure_logging()
 
-fig_promising = pio.read_json("figures/fig_promising.json")
-fig_bar = pio.read_json("figures/fig_bar.json")
-fig_violin = pio.read_json("figures/fig_violin.json")
+# Grouped player data behind each heatmap
+HEATMAP_SOURCES = {
+    'bk': 'grouped_players/bk_players.csv',
+    'mf': 'grouped_players/mf_players.csv',
+    'fw': 'grouped_players/fw_players.csv',
+}
+figure_cache = FigureCache(maxsize=64)
+
+# Heatmap controls; only the selected page of players is sent to the browser
+HEATMAP_TOP_N = [10, 25, 50, 100]
+HEATMAP_DEFAULTS = dict(attributes=(), min_ratio=100, top_n=25, page=0)
+ALL_ATTRIBUTES = sorted({attr for attrs in POSITION_ATTRIBUTES.values() for attr in attrs})
+
+
+# Live brush on the promising-players scatter: the (age, potential) points of
+# every young player are loaded once and tested against the brush polygon
+_brush_pool = None
+
+
+def brush_pool():
+    """(players, points) the scatter brush selects from: latest attributes, age and position of
+    every young player, and their ``(n, 2)`` (age, potential) array. Loaded on first use; without
+    Player_Attributes.csv or the match data only the grouped players can be brushed."""
+    global _brush_pool
+    if _brush_pool is None:
+        try:
+            if 'role' not in player_index.players:
+                raise FileNotFoundError('Match.csv is needed for player roles')
+            pool = load_young_players(columns=None)
+            pool['position'] = pool['player_api_id'].map(player_index.players['role']).str.lower()
+        except FileNotFoundError:
+            pool = pd.concat([
+                grouped_players(position, data_version(path)).assign(position=position)
+                for position, path in HEATMAP_SOURCES.items()
+            ], ignore_index=True)
+            pool['age'] = player_age(pool['player_api_id'].map(player_index.players['birthday']), REFERENCE_DATE)
+        pool['potential_rating_ratio'] = pool['potential'] / pool['overall_rating'] * 100
+        pool = pool.reset_index(drop=True)
+        _brush_pool = pool, pool[['age', 'potential']].to_numpy(dtype=float)
+    return _brush_pool
+
+
+def as_brush(vertices):
+    """Hashable brush polygon from a list of [age, potential] vertices, or None."""
+    if not vertices or len(vertices) < 3:
+        return None
+    return tuple((round(float(x), 3), round(float(y), 3)) for x, y in vertices)
+
+
+def selection_polygon(selected):
+    """Vertices of a scatter lasso or box selection (plotly ``selectedData``), or None."""
+    if not selected:
+        return None
+    if selected.get('lassoPoints'):
+        return [list(vertex) for vertex in zip(selected['lassoPoints']['x'], selected['lassoPoints']['y'])]
+    if selected.get('range'):
+        (x0, x1), (y0, y1) = selected['range']['x'], selected['range']['y']
+        return [[x0, y0], [x0, y1], [x1, y1], [x1, y0]]
+    return None
+
+
+@lru_cache(maxsize=32)
+def brushed_players(brush):
+    pool, points = brush_pool()
+    return pool[points_in_polygon(points, brush)]
+
+
+@lru_cache(maxsize=len(HEATMAP_SOURCES) * 16)
+def grouped_players(position, version, brush=None):
+    # The brushed players of that position, or the grouped CSV written by heatmap.py
+    if brush is not None:
+        players = brushed_players(brush)
+        return players[players['position'] == position]
+    # One row per player: the grouped CSVs may hold every dated snapshot
+    return latest_snapshots(pd.read_csv(HEATMAP_SOURCES[position]))
+
+
+def heatmap_figure(position, attributes=(), min_ratio=None, top_n=None, page=0, brush=None):
+    # Rebuilt only when the grouped CSV behind it, the brush or the filters change
+    version = data_version(HEATMAP_SOURCES[position])
+    return figure_cache.get(
+        (position, version, brush, tuple(attributes), min_ratio, top_n, page),
+        lambda: create_heatmap(
+            grouped_players(position, version, brush), position, list(attributes), min_ratio, top_n, page
+        )
+    )
+
+
+def heatmap_pages(attributes=(), min_ratio=None, top_n=None, brush=None):
+    versions = tuple(data_version(path) for path in HEATMAP_SOURCES.values())
+    return _heatmap_pages(tuple(attributes), min_ratio, top_n, versions, brush)
+
+
+def heatmap_view(top_n, min_ratio, attributes, page, brush=None):
+    """Heatmap figure per position for a (1-based, clamped) page, and the page count."""
+    attributes = tuple(sorted(attributes or ()))
+    pages = heatmap_pages(attributes, min_ratio, top_n, brush)
+    page = min(max(int(page or 1), 1), pages) - 1
+    return {
+        position: heatmap_figure(position, attributes, min_ratio, top_n, page, brush) for position in HEATMAP_SOURCES
+    }, pages
+
+
+@lru_cache(maxsize=256)
+def _heatmap_pages(attributes, min_ratio, top_n, versions, brush=None):
+    sizes = [
+        len(heatmap_frame(grouped_players(position, version, brush), position, list(attributes), min_ratio))
+        for position, version in zip(HEATMAP_SOURCES, versions)
+    ]
+    return page_count(max(sizes), top_n)
+
+
+# Player search on the heatmap tab
+player_index = PlayerIndex.load()
+HISTORY_COLUMNS = ['overall_rating', 'potential']
+_attribute_history = None
+
+
+def attribute_history():
+    # Loaded on first search; the grouped snapshots stand in when Player_Attributes.csv is absent
+    global _attribute_history
+    if _attribute_history is None:
+        try:
+            _attribute_history = AttributeHistory.load(columns=HISTORY_COLUMNS)
+        except FileNotFoundError:
+            _attribute_history = AttributeHistory(pd.concat(
+                [pd.read_csv(path) for path in HEATMAP_SOURCES.values()], ignore_index=True
+            ).drop_duplicates(['player_api_id', 'date']))
+    return _attribute_history
+
+
+def locate_player(player_id, top_n, min_ratio, attributes, brush=None):
+    """(position, 1-based page, row label) of a player on the heatmaps, or None."""
+    for position, path in HEATMAP_SOURCES.items():
+        df = grouped_players(position, data_version(path), brush)
+        rows = (df['player_api_id'] == player_id).to_numpy()
+        if not rows.any():
+            continue
+        label = player_labels(df)[rows].iloc[0]
+        frame = heatmap_frame(df, position, list(attributes or ()), min_ratio)
+        if label in frame.index:
+            row = frame.index.get_loc(label)
+            return position, (row // top_n + 1) if top_n else 1, label
+    return None
+
+
+def highlight_row(figure, label):
+    """Copy of a heatmap figure dict with a frame around the row ``label``, if shown."""
+    trace = figure['data'][0]
+    rows = list(trace['y'])
+    if label not in rows:
+        return figure
+    i = rows.index(label)
+    shape = dict(type='rect', xref='x', yref='y', x0=-0.5, x1=len(trace['x']) - 0.5, y0=i - 0.5, y1=i + 0.5,
+                 line=dict(color='red', width=3))
+    layout = dict(figure.get('layout', {}))
+    layout['shapes'] = list(layout.get('shapes', ())) + [shape]
+    return dict(figure, layout=layout)
+
+
+# "Find similar players" for a clicked heatmap row: a KD-tree per position, loaded on first click
+SIMILAR_K = 10
+_similarity_indexes = None
+
+
+def similarity_indexes():
+    global _similarity_indexes
+    if _similarity_indexes is None:
+        _similarity_indexes = load_indexes()
+    return _similarity_indexes
+
+
+def row_player(position, label, brush=None):
+    """player_api_id behind a heatmap row label, or None."""
+    df = grouped_players(position, data_version(HEATMAP_SOURCES[position]), brush)
+    rows = (player_labels(df) == label).to_numpy()
+    return int(df['player_api_id'][rows].iloc[0]) if rows.any() else None
+
+
+def similar_players(position, player_id, label):
+    index = similarity_indexes()[position]
+    if player_id not in index:
+        return html.P(f'{label} is not in the {position.upper()} similarity index.')
+    similar = index.similar(player_id, SIMILAR_K)
+    names = [player_index.label(i) if i in player_index else str(i) for i in similar['player_api_id']]
+    columns = ['distance'] + index.attributes
+    cell = {'padding': '2px 6px', 'borderBottom': '1px solid #ddd', 'textAlign': 'right'}
+    return html.Div([
+        html.H4(f'Players most similar to {label} ({position.upper()})'),
+        html.Table([
+            html.Tr([html.Th('Player', style=dict(cell, textAlign='left'))] + [html.Th(c, style=cell) for c in columns]),
+            *[
+                html.Tr([html.Td(name, style=dict(cell, textAlign='left'))] + [
+                    html.Td(f'{value:g}', style=cell) for value in row
+                ])
+                for name, row in zip(names, similar[columns].itertuples(index=False))
+            ],
+        ], style={'borderCollapse': 'collapse', 'fontSize': '12px'}),
+    ])
+
+
+def history_figure(player_id):
+    if player_id is None:
+        return go.Figure(layout=dict(title='Search for a player to see their attribute history',
+                                     plot_bgcolor='white', paper_bgcolor='white'))
+    history = attribute_history().history(player_id)
+    fig = go.Figure([
+        go.Scatter(x=pd.to_datetime(history['date']), y=history[column], mode='lines+markers', name=column)
+        for column in HISTORY_COLUMNS
+    ])
+    title = player_index.label(player_id) if player_id in player_index else str(player_id)
+    fig.update_layout(title=f'{title}: attribute history' + ('' if len(history) else ' (no snapshots)'),
+                      yaxis_title='Rating', plot_bgcolor='white', paper_bgcolor='white')
+    return fig
+
+
+fig_promising = load_figure("figures/fig_promising.json.gz")
+fig_bar = load_figure("figures/fig_bar.json.gz")
+fig_violin = load_figure("figures/fig_violin.json.gz")
+
+
+def promising_figure(brush=None):
+    """The scatter in lasso mode, showing ``brush`` in place of the default brush."""
+    layout = dict(fig_promising.get('layout', {}), dragmode='lasso')
+    if brush is not None:
+        shape = dict(type='path', path=polygon_path(brush), fillcolor='rgba(0,128,0,0.1)',
+                     line=dict(color='green'), layer='below')
+        layout['shapes'] = [shape]
+    return dict(fig_promising, layout=layout)
+
+
+def brush_param(brush):
+    return ';'.join(f'{x:g},{y:g}' for x, y in brush) if brush else None
+
+
+def parse_brush(text):
+    try:
+        return as_brush([vertex.split(',') for vertex in text.split(';')]) if text else None
+    except ValueError:
+        abort(400, 'Malformed brush')
+
+# Teams for the team analysis tab. Reports are built from Match.csv; without it only the
+# figures saved by bar_and_violin_interactive.py (TEAM_ID over all seasons) can be shown
+TEAM_ID = 8558
+team_options = [
+    {'label': name, 'value': team_id}
+    for team_id, name in load_table('Team', columns=['team_api_id', 'team_long_name'])
+    .sort_values('team_long_name').itertuples(index=False)
+]
+team_names = {option['value']: option['label'] for option in team_options}
+
+
+def team_figures(team_id, seasons=()):
+    def build():
+        report = build_team_report(team_id, list(seasons) or None)
+        return {name: encode_arrays(fig) for name, fig in report.items()}
+
+    try:
+        return figure_cache.get(('team', team_id, tuple(seasons)), build)
+    except FileNotFoundError:
+        if team_id == TEAM_ID and not seasons:
+            return {'bar': fig_bar, 'violin': fig_violin}
+        raise
+
+
+# In-game possession curves, loaded on first use; they need Match.csv for the teams of each match
+_possession_curves = None
+
+
+def possession_curves():
+    global _possession_curves
+    if _possession_curves is None:
+        _possession_curves = load_possession_curves()
+    return _possession_curves
+
+
+def team_possession_figure(team_id, seasons=()):
+    def build():
+        curves = possession_curves()
+        mean, matches = curves.curve(team_id, list(seasons))
+        title = f"{team_names.get(team_id, team_id)}: possession by minute, {', '.join(seasons) or 'all seasons'}"
+        return encode_arrays(possession_figure(curves.minutes, mean, matches, title))
+
+    return figure_cache.get(('possession', team_id, tuple(seasons)), build)
+
+
+# Elo ratings and form, updated with the matches added since the last run; need Match.csv
+_team_ratings = None
+RATINGS_TOP_N = 20
+
+
+def team_ratings():
+    global _team_ratings
+    if _team_ratings is None:
+        _team_ratings = load_ratings()
+    return _team_ratings
+
+
+def ratings_figures(team_ids, date):
+    """Rating history of ``team_ids`` and the top teams as of ``date``."""
+    def build():
+        ratings = team_ratings()
+        histories = {team_names.get(team_id, str(team_id)): ratings.team_history(team_id) for team_id in team_ids}
+        table = ratings.as_of(date)
+        table = table[table['matches'] > 0].nlargest(RATINGS_TOP_N, 'rating')
+        return {
+            'history': encode_arrays(ratings_figure(histories, date)),
+            'standings': encode_arrays(standings_figure(table, team_names, f'Top {RATINGS_TOP_N} teams as of {date}')),
+        }
+
+    return figure_cache.get(('ratings', tuple(team_ids), date), build)
+
+
+# Shot maps: grids binned once per team and season, summed over the selected seasons on request
+shot_maps = load_shot_maps()
+shot_team_options = [option for option in team_options if option['value'] in set(shot_maps.teams())]
+SHOT_TEAM_ID = TEAM_ID if any(option['value'] == TEAM_ID for option in shot_team_options) else (
+    shot_team_options[0]['value'] if shot_team_options else None)
+SHOT_SEASONS = [season for season in shot_maps.seasons if season != UNKNOWN_SEASON]
+SHOT_KINDS = [
+    {'label': 'All shots', 'value': 'shots'},
+    {'label': 'On target', 'value': 'shots_on'},
+    {'label': 'Off target', 'value': 'shots_off'},
+    {'label': 'Goals', 'value': 'goals'},
+]
+SHOT_KIND_LABELS = {option['value']: option['label'] for option in SHOT_KINDS}
+
+
+def shot_figure(team_id, seasons=(), kind='shots', per_match=False):
+    def build():
+        grid = shot_maps.grid(team_id, list(seasons), kind, per_match)
+        title = f"{team_names.get(team_id, team_id)}: {SHOT_KIND_LABELS[kind].lower()}, {', '.join(seasons) or 'all seasons'}"
+        return encode_arrays(shot_map_figure(grid, title, per_match))
+
+    return figure_cache.get(('shots', team_id, tuple(seasons), kind, per_match), build)
+
+
+# Static HTML/PNG/SVG/PDF downloads of the figures on screen
+export_cache = ExportCache()
+
+
+def export_links(name, **params):
+    query = urlencode({key: value for key, value in params.items() if value not in (None, '')})
+    return [
+        html.A(fmt.upper(), href=f'/export/{name}.{fmt}' + (f'?{query}' if query else ''),
+               style={'marginRight': '10px'})
+        for fmt in FORMATS
+    ]
+
+
+def export_figure(name):
+    """The figure behind an export URL, given the view's filters in the query string."""
+    args = request.args
+    brush = parse_brush(args.get('brush'))
+    if name == 'promising':
+        return promising_figure(brush)
+    if name.startswith('heatmap-') and name[len('heatmap-'):] in HEATMAP_SOURCES:
+        figures, _ = heatmap_view(
+            args.get('top_n', HEATMAP_DEFAULTS['top_n'], type=int),
+            args.get('min_ratio', HEATMAP_DEFAULTS['min_ratio'], type=int),
+            [attr for attr in args.get('attributes', '').split(',') if attr],
+            args.get('page', 1, type=int),
+            brush,
+        )
+        return figures[name[len('heatmap-'):]]
+    if name in ('team-bar', 'team-violin'):
+        seasons = tuple(sorted(season for season in args.get('seasons', '').split(',') if season))
+        try:
+            return team_figures(args.get('team_id', TEAM_ID, type=int), seasons)[name[len('team-'):]]
+        except FileNotFoundError:
+            abort(404, 'Team reports need data/Match.csv')
+        except ValueError as e:
+            abort(404, str(e))
+    if name == 'shots':
+        seasons = tuple(sorted(season for season in args.get('seasons', '').split(',') if season))
+        kind = args.get('kind', 'shots')
+        if kind not in SHOT_KIND_LABELS:
+            abort(404)
+        try:
+            return shot_figure(args.get('team_id', SHOT_TEAM_ID, type=int), seasons, kind,
+                               args.get('per_match', 0, type=int) == 1)
+        except ValueError as e:
+            abort(404, str(e))
+    abort(404)
+
+
+# Warm the heatmap cache so the first tab switch is served from memory
+for position in HEATMAP_SOURCES:
+    heatmap_figure(position, **HEATMAP_DEFAULTS)
 
 # Define the app
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 app.title = "RCD Espanyol Player Insights"
+server = app.server  # WSGI application, see wsgi.py
+register_metrics(app.server)
+compress_responses(app.server)
+
+
+@app.server.route('/export/<name>.<fmt>')
+def download_export(name, fmt):
+    if fmt not in FORMATS:
+        abort(404)
+    try:
+        path = export_cache.get(export_figure(name), fmt)
+    except RuntimeError as e:  # image formats without kaleido
+        abort(501, str(e))
+    return send_file(path, mimetype=FORMATS[fmt], as_attachment=True, download_name=f'{name}.{fmt}')
+
+
 app.layout = html.Div([
     html.Div([
         html.Img(src="assets/logo.png", style={
@@ -48,26 +463,72 @@ app.layout = html.Div([
             'fontFamily': 'Arial'
         }, selected_style={
             'backgroundColor': '#f0f0f0', 'fontWeight': 'bold'
+        }),
+        dcc.Tab(label='Shot Maps', value='tab-4', style={
+            'fontFamily': 'Arial'
+        }, selected_style={
+            'backgroundColor': '#f0f0f0', 'fontWeight': 'bold'
+        }),
+        dcc.Tab(label='Team Ratings', value='tab-5', style={
+            'fontFamily': 'Arial'
+        }, selected_style={
+            'backgroundColor': '#f0f0f0', 'fontWeight': 'bold'
         })
     ]),
 
+    # Brush polygon drawn on the scatter; None means the default brush behind the grouped CSVs
+    dcc.Store(id='promising-brush', data=None),
     html.Div(id='tabs-content')
 ])
 
 @app.callback(Output('tabs-content', 'children'), Input('tabs', 'value'))
+@instrument('render_content', args=('tab',))
 def render_content(tab):
     if tab == 'tab-1':
         return html.Div([
             html.H3('Scatter plot'),
-            dcc.Graph(figure=fig_promising, style={'display': 'inline-block', 'width': '60%'})
+            html.Div([
+                html.Span('Draw a lasso or box around players to show them on the heatmaps. ',
+                          id='brush-summary'),
+                html.Button('Reset brush', id='brush-reset', n_clicks=0),
+            ], style={'fontFamily': 'Arial', 'marginBottom': '10px'}),
+            dcc.Graph(id='promising-scatter', figure=promising_figure(),
+                      style={'display': 'inline-block', 'width': '60%'}),
+            html.Div(id='promising-exports', style={'fontFamily': 'Arial'})
         ])
     elif tab == 'tab-2':
         return html.Div([
             html.H3('Player Attribute Heatmaps per position'),
             html.Div([
-                dcc.Graph(figure=create_heatmap(df_bk, 'bk'), style={'display': 'inline-block', 'width': '33%'}),
-                dcc.Graph(figure=create_heatmap(df_mf, 'mf'), style={'display': 'inline-block', 'width': '33%'}),
-                dcc.Graph(figure=create_heatmap(df_fw, 'fw'), style={'display': 'inline-block', 'width': '33%'})
+                html.Div([
+                    html.Label('Find player'),
+                    dcc.Dropdown(id='player-search', options=[], placeholder='Type a name...')
+                ], style={'width': '25%'}),
+                html.Div([
+                    html.Label('Players per page'),
+                    dcc.Dropdown(id='heatmap-top-n', options=HEATMAP_TOP_N,
+                                 value=HEATMAP_DEFAULTS['top_n'], clearable=False)
+                ], style={'width': '12%'}),
+                html.Div([
+                    html.Label('Minimum potential ratio'),
+                    dcc.Slider(id='heatmap-min-ratio', min=100, max=150, step=5,
+                               value=HEATMAP_DEFAULTS['min_ratio'])
+                ], style={'width': '30%'}),
+                html.Div([
+                    html.Label('Attributes'),
+                    dcc.Dropdown(id='heatmap-attributes', options=ALL_ATTRIBUTES, multi=True,
+                                 placeholder='All attributes')
+                ], style={'width': '35%'}),
+                html.Div([
+                    html.Label(id='heatmap-page-label'),
+                    dcc.Input(id='heatmap-page', type='number', min=1, step=1, value=1)
+                ], style={'width': '12%'}),
+            ], style={'display': 'flex', 'gap': '20px', 'fontFamily': 'Arial', 'marginBottom': '10px'}),
+            html.Div(id='heatmap-exports', style={'fontFamily': 'Arial', 'marginBottom': '10px'}),
+            html.Div([
+                dcc.Graph(id='heatmap-bk', style={'display': 'inline-block', 'width': '33%'}),
+                dcc.Graph(id='heatmap-mf', style={'display': 'inline-block', 'width': '33%'}),
+                dcc.Graph(id='heatmap-fw', style={'display': 'inline-block', 'width': '33%'})
             ], style={
         'display': 'flex',
         'position': 'relative',
@@ -81,13 +542,232 @@ def render_content(tab):
         'zIndex': 0,
         'color': 'white',
     }),
+    html.Div(id='similar-players', children='Click a player on a heatmap to find similar players.',
+             style={'fontFamily': 'Arial', 'margin': '10px 0'}),
+    dcc.Graph(id='player-history', style={'width': '70%'}),
 ], style={'position': 'relative'})
     elif tab == 'tab-3':
         return html.Div([
             html.H3('Bar and Violin plots'),
-            dcc.Graph(figure=fig_bar, style={'display': 'inline-block', 'width': '70%'}),
-            dcc.Graph(figure=fig_violin,style={'display': 'inline-block', 'width': '70%'})
+            html.Div([
+                html.Div([
+                    html.Label('Team'),
+                    dcc.Dropdown(id='team-select', options=team_options, value=TEAM_ID, clearable=False)
+                ], style={'width': '30%'}),
+                html.Div([
+                    html.Label('Seasons'),
+                    dcc.Dropdown(id='team-seasons', options=SEASONS, multi=True, placeholder='All seasons')
+                ], style={'width': '40%'}),
+            ], style={'display': 'flex', 'gap': '20px', 'fontFamily': 'Arial', 'marginBottom': '10px'}),
+            dcc.Graph(id='team-bar', style={'display': 'inline-block', 'width': '70%'}),
+            dcc.Graph(id='team-violin', style={'display': 'inline-block', 'width': '70%'}),
+            dcc.Graph(id='team-possession', style={'width': '70%'}),
+            html.Div(id='team-exports', style={'fontFamily': 'Arial'})
+        ])
+    elif tab == 'tab-4':
+        return html.Div([
+            html.H3('Shot and goal locations'),
+            html.Div([
+                html.Div([
+                    html.Label('Team'),
+                    dcc.Dropdown(id='shot-team', options=shot_team_options, value=SHOT_TEAM_ID, clearable=False)
+                ], style={'width': '30%'}),
+                html.Div([
+                    html.Label('Seasons'),
+                    dcc.Dropdown(id='shot-seasons', options=SHOT_SEASONS, multi=True, placeholder='All seasons')
+                ], style={'width': '30%'}),
+                html.Div([
+                    html.Label('Events'),
+                    dcc.RadioItems(id='shot-kind', options=SHOT_KINDS, value='shots', inline=True)
+                ], style={'width': '25%'}),
+                html.Div([
+                    dcc.Checklist(id='shot-per-match', options=[{'label': 'Per match', 'value': 'per_match'}],
+                                  value=[])
+                ], style={'width': '15%', 'alignSelf': 'flex-end'}),
+            ], style={'display': 'flex', 'gap': '20px', 'fontFamily': 'Arial', 'marginBottom': '10px'}),
+            dcc.Graph(id='shot-map', style={'width': '70%'}),
+            html.Div(id='shot-exports', style={'fontFamily': 'Arial'})
         ])
+    elif tab == 'tab-5':
+        return html.Div([
+            html.H3('Elo ratings and form'),
+            html.Div([
+                html.Div([
+                    html.Label('Teams'),
+                    dcc.Dropdown(id='ratings-teams', options=team_options, value=[TEAM_ID], multi=True)
+                ], style={'width': '50%'}),
+                html.Div([
+                    html.Label('As of'),
+                    dcc.DatePickerSingle(id='ratings-date', date='2016-05-31', display_format='YYYY-MM-DD')
+                ], style={'width': '20%'}),
+            ], style={'display': 'flex', 'gap': '20px', 'fontFamily': 'Arial', 'marginBottom': '10px'}),
+            dcc.Graph(id='ratings-history', style={'width': '70%'}),
+            dcc.Graph(id='ratings-standings', style={'width': '70%'}),
+        ])
+
+
+@app.callback(
+    Output('promising-brush', 'data'),
+    [Input('promising-scatter', 'selectedData'), Input('brush-reset', 'n_clicks')],
+    prevent_initial_call=True
+)
+def set_brush(selected, reset_clicks):
+    if dash.ctx.triggered_id == 'brush-reset':
+        return None
+    # A cleared selection (double click) keeps the last brush
+    return selection_polygon(selected) or no_update
+
+
+@app.callback(
+    [Output('promising-scatter', 'figure'), Output('brush-summary', 'children'),
+     Output('promising-exports', 'children')],
+    Input('promising-brush', 'data')
+)
+@instrument('update_brush')
+def update_brush(vertices):
+    brush = as_brush(vertices)
+    if brush is None:
+        summary = 'Default brush. Draw a lasso or box around players to show them on the heatmaps. '
+    else:
+        counts = brushed_players(brush)['position'].value_counts()
+        summary = f'{len(brushed_players(brush))} players inside the brush (' + ', '.join(
+            f'{counts.get(position, 0)} {position.upper()}' for position in HEATMAP_SOURCES
+        ) + '). '
+    exports = ['Download: '] + export_links('promising', brush=brush_param(brush))
+    return promising_figure(brush), summary, exports
+
+
+@app.callback(
+    [Output('heatmap-bk', 'figure'), Output('heatmap-mf', 'figure'), Output('heatmap-fw', 'figure'),
+     Output('heatmap-page-label', 'children'), Output('heatmap-exports', 'children')],
+    [Input('heatmap-top-n', 'value'), Input('heatmap-min-ratio', 'value'),
+     Input('heatmap-attributes', 'value'), Input('heatmap-page', 'value'), Input('player-search', 'value'),
+     Input('promising-brush', 'data')]
+)
+@instrument('update_heatmaps', args=('top_n', 'page'))
+def update_heatmaps(top_n, min_ratio, attributes, page, player_id, vertices=None):
+    brush = as_brush(vertices)
+    figures, pages = heatmap_view(top_n, min_ratio, attributes, page, brush)
+    found = locate_player(player_id, top_n, min_ratio, attributes, brush) if player_id is not None else None
+    if found:
+        position, _, label = found
+        figures[position] = highlight_row(figures[position], label)
+    params = dict(top_n=top_n, min_ratio=min_ratio, attributes=','.join(sorted(attributes or ())), page=page,
+                  brush=brush_param(brush))
+    exports = ['Download: ']
+    for position in HEATMAP_SOURCES:
+        exports += [f'{position.upper()} '] + export_links(f'heatmap-{position}', **params)
+    return list(figures.values()) + [f'Page (of {pages})', exports]
+
+
+@app.callback(
+    Output('similar-players', 'children'),
+    [Input('heatmap-bk', 'clickData'), Input('heatmap-mf', 'clickData'), Input('heatmap-fw', 'clickData')],
+    State('promising-brush', 'data'),
+    prevent_initial_call=True
+)
+@instrument('find_similar')
+def find_similar(bk_click, mf_click, fw_click, vertices=None):
+    position = (dash.ctx.triggered_id or '').replace('heatmap-', '')
+    click = {'bk': bk_click, 'mf': mf_click, 'fw': fw_click}.get(position)
+    if not click or not click.get('points'):
+        return no_update
+    label = click['points'][0]['y']
+    player_id = row_player(position, label, as_brush(vertices))
+    if player_id is None:
+        return no_update
+    return similar_players(position, player_id, label)
+
+
+@app.callback(
+    Output('player-search', 'options'),
+    Input('player-search', 'search_value'),
+    State('player-search', 'value')
+)
+def search_players(query, selected):
+    ids = player_index.search(query or '', limit=20)
+    if selected is not None and selected not in ids and selected in player_index:
+        ids.append(selected)  # the dropdown drops a value missing from its options
+    return [{'label': player_index.label(player_id), 'value': player_id} for player_id in ids]
+
+
+@app.callback(
+    [Output('heatmap-page', 'value'), Output('player-history', 'figure')],
+    Input('player-search', 'value'),
+    [State('heatmap-top-n', 'value'), State('heatmap-min-ratio', 'value'), State('heatmap-attributes', 'value'),
+     State('promising-brush', 'data')]
+)
+@instrument('select_player', args=('player_id',))
+def select_player(player_id, top_n, min_ratio, attributes, vertices=None):
+    brush = as_brush(vertices)
+    found = locate_player(player_id, top_n, min_ratio, attributes, brush) if player_id is not None else None
+    return (found[1] if found else no_update), history_figure(player_id)
+
+
+@app.callback(
+    [Output('team-bar', 'figure'), Output('team-violin', 'figure'), Output('team-exports', 'children')],
+    [Input('team-select', 'value'), Input('team-seasons', 'value')]
+)
+@instrument('update_team_report', args=('team_id',))
+def update_team_report(team_id, seasons):
+    try:
+        figures = team_figures(team_id, tuple(sorted(seasons or ())))
+    except (FileNotFoundError, ValueError) as e:
+        message = 'Team reports need data/Match.csv' if isinstance(e, FileNotFoundError) else str(e)
+        empty = go.Figure(layout=dict(title=message, plot_bgcolor='white', paper_bgcolor='white'))
+        return empty, empty, []
+    params = dict(team_id=team_id, seasons=','.join(sorted(seasons or ())))
+    exports = ['Download: bar '] + export_links('team-bar', **params) + ['violin '] + export_links('team-violin', **params)
+    return figures['bar'], figures['violin'], exports
+
+
+@app.callback(
+    Output('team-possession', 'figure'),
+    [Input('team-select', 'value'), Input('team-seasons', 'value')]
+)
+@instrument('update_possession', args=('team_id',))
+def update_possession(team_id, seasons):
+    try:
+        return team_possession_figure(team_id, tuple(sorted(seasons or ())))
+    except FileNotFoundError:
+        message = 'Possession curves need data/Match.csv'
+    except ValueError as e:
+        message = str(e)
+    return go.Figure(layout=dict(title=message, plot_bgcolor='white', paper_bgcolor='white'))
+
+
+@app.callback(
+    [Output('shot-map', 'figure'), Output('shot-exports', 'children')],
+    [Input('shot-team', 'value'), Input('shot-seasons', 'value'), Input('shot-kind', 'value'),
+     Input('shot-per-match', 'value')]
+)
+@instrument('update_shot_map', args=('team_id', 'kind'))
+def update_shot_map(team_id, seasons, kind, per_match):
+    seasons = tuple(sorted(seasons or ()))
+    per_match = 'per_match' in (per_match or ())
+    try:
+        figure = shot_figure(team_id, seasons, kind, per_match)
+    except ValueError as e:
+        return go.Figure(layout=dict(title=str(e), plot_bgcolor='white', paper_bgcolor='white')), []
+    params = dict(team_id=team_id, seasons=','.join(seasons), kind=kind, per_match=int(per_match))
+    return figure, ['Download: '] + export_links('shots', **params)
+
+
+@app.callback(
+    [Output('ratings-history', 'figure'), Output('ratings-standings', 'figure')],
+    [Input('ratings-teams', 'value'), Input('ratings-date', 'date')]
+)
+@instrument('update_ratings', args=('date',))
+def update_ratings(team_ids, date):
+    try:
+        figures = ratings_figures(tuple(team_ids or ()), (date or '2016-05-31')[:10])
+    except FileNotFoundError:
+        empty = go.Figure(layout=dict(title='Ratings need data/Match.csv', plot_bgcolor='white',
+                                      paper_bgcolor='white'))
+        return empty, empty
+    return figures['history'], figures['standings']
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server; serve wsgi.py with gunicorn for several analysts at once
+    app.run(debug=os.environ.get('VDS_DEBUG', '1') == '1')
@@ -2,44 +2,35 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+from data_store import load_table
+from results import team_matches
 
 TEAM_ID = 8558
 BASELINE = 1.1
 TOP_N = 5
 
 
-matches = pd.read_csv("Match.csv")
-match_possesion = pd.read_csv("Match_Possesion.csv")
-match_shots_on = pd.read_csv("Match_Shots_On.csv")
-match_shots_off = pd.read_csv("Match_Shots_Off.csv")
-
-team = pd.read_csv("Team.csv")
-team_attr = pd.read_csv("Team_Attributes.csv")
-
-
-# Points function
-def pts(f, a):
-    return 3 if f > a else 1 if f == a else 0
+matches = load_table(
+    "Match",
+    columns=[
+        "home_team_api_id",
+        "away_team_api_id",
+        "home_team_goal",
+        "away_team_goal",
+    ],
+)
+match_possesion = load_table("Match_Possesion")
+match_shots_on = load_table("Match_Shots_On")
+match_shots_off = load_table("Match_Shots_Off")
 
+team = load_table("Team", columns=["team_api_id", "team_long_name"])
+team_attr = load_table("Team_Attributes")
 
-# Calculate points long format for TEAM_ID
-matches["home_points"] = matches.apply(
-    lambda r: pts(r.home_team_goal, r.away_team_goal), axis=1
-)
-matches["away_points"] = matches.apply(
-    lambda r: pts(r.away_team_goal, r.home_team_goal), axis=1
-)
 
-home = matches[matches.home_team_api_id == TEAM_ID][
-    ["home_team_api_id", "away_team_api_id", "home_points"]
+# Points earned by TEAM_ID in each of its matches
+df = team_matches(matches, TEAM_ID)[
+    ["team_api_id", "opponent_team_api_id", "points"]
 ]
-home.columns = ["team_api_id", "opponent_team_api_id", "points"]
-away = matches[matches.away_team_api_id == TEAM_ID][
-    ["away_team_api_id", "home_team_api_id", "away_points"]
-]
-away.columns = ["team_api_id", "opponent_team_api_id", "points"]
-
-df = pd.concat([home, away], ignore_index=True)
 avg_pts = df.groupby("opponent_team_api_id")["points"].mean().reset_index()
 
 # Add team names
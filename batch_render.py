@@ -0,0 +1,222 @@
+"""Batch rendering of the heatmap and team figures across a process pool.
+
+The inputs every figure needs (grouped players per position, the league-wide
+points table and team names) are written once as column-wise .npy files and
+memory-mapped by each worker, next to the memory-mapped team cube, so nothing
+is pickled per task. Every job writes one figure artifact:
+
+    figures/catalogue/heatmap/<position>/top<N>-page<P>.json.gz
+    figures/catalogue/team/<team_id>/<season or all>-<bar|violin>.json.gz
+
+plus ``manifest.json`` listing them.
+
+    python batch_render.py                 # every position page, team and season
+    python batch_render.py -j 8 --teams 8558 8633 --all-seasons-only
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR
+from figure_store import save_figure
+from heatmap import GROUPED_DIR, POSITION_ATTRIBUTES, create_heatmap, heatmap_frame, page_count
+from instrumentation import configure_logging, stage
+from team_cube import TeamCube, cube_path
+from team_report import SEASONS, TeamAnalysis, get_analysis
+
+OUT_DIR = os.path.join("figures", "catalogue")
+HEATMAP_TOP_N = 25
+HEATMAP_MIN_RATIO = 100
+
+
+def save_columns(df, path):
+    """Write ``df`` as one .npy per column; text columns become fixed-width unicode."""
+    os.makedirs(path, exist_ok=True)
+    columns = []
+    for i, (name, values) in enumerate(df.items()):
+        if values.dtype.kind in "biufcmM":
+            arr = values.to_numpy()
+        else:
+            arr = values.fillna("").astype(str).to_numpy(dtype=str)
+        np.save(os.path.join(path, f"{i}.npy"), arr)
+        columns.append(name)
+    with open(os.path.join(path, "columns.json"), "w") as f:
+        json.dump(columns, f)
+
+
+def load_columns(path):
+    """DataFrame over the memory-mapped columns written by ``save_columns``.
+
+    Numeric columns are views of the memory maps, so every worker reads the
+    same pages; only the text columns are converted per process. Keep them
+    views by assigning an index rather than ``set_index``/``sort_index``,
+    which may copy every column.
+    """
+    with open(os.path.join(path, "columns.json")) as f:
+        columns = json.load(f)
+    return pd.DataFrame({
+        name: np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r") for i, name in enumerate(columns)
+    }, copy=False)
+
+
+def grouped_path(position):
+    return os.path.join(GROUPED_DIR, f"{position}_players.csv")
+
+
+def export_shared(path, positions, analysis):
+    """Write the shared worker inputs to ``path``."""
+    from snapshots import latest_snapshots
+
+    for position in positions:
+        save_columns(latest_snapshots(pd.read_csv(grouped_path(position))), os.path.join(path, "grouped", position))
+    if analysis is not None:
+        # Sorted on disk so the workers can index it without sorting (and copying) it
+        save_columns(analysis.opponent_points.sort_index().reset_index(), os.path.join(path, "opponent_points"))
+        save_columns(analysis.team_names.rename_axis("team_api_id").reset_index(), os.path.join(path, "team_names"))
+
+
+_shared = {}
+
+
+def _init_worker(path, cube_dir):
+    _shared["path"] = path
+    _shared["cube_dir"] = cube_dir
+
+
+def _grouped(position):
+    key = ("grouped", position)
+    if key not in _shared:
+        _shared[key] = load_columns(os.path.join(_shared["path"], "grouped", position))
+    return _shared[key]
+
+
+def _analysis():
+    if "analysis" not in _shared:
+        points = load_columns(os.path.join(_shared["path"], "opponent_points"))
+        names = load_columns(os.path.join(_shared["path"], "team_names"))
+        # Only the index is built per worker; the points columns stay memory-mapped
+        points.index = pd.MultiIndex.from_arrays(
+            [points.pop(key) for key in ["team_api_id", "season", "opponent_team_api_id"]]
+        )
+        _shared["analysis"] = TeamAnalysis(
+            points,
+            pd.Series(names["team_long_name"].to_numpy(), index=names["team_api_id"].to_numpy()),
+            TeamCube.load(_shared["cube_dir"]),
+        )
+    return _shared["analysis"]
+
+
+def heatmap_job_path(out_dir, position, top_n, page):
+    return os.path.join(out_dir, "heatmap", position, f"top{top_n}-page{page}.json.gz")
+
+
+def team_job_path(out_dir, team_id, season, name):
+    label = season.replace("/", "-") if season else "all"
+    return os.path.join(out_dir, "team", str(team_id), f"{label}-{name}.json.gz")
+
+
+def render_job(job):
+    """Build and save the figure(s) of one job; returns ``(job, paths, seconds, error)``."""
+    start = time.perf_counter()
+    kind, out_dir = job[0], job[1]
+    try:
+        if kind == "heatmap":
+            _, _, position, top_n, page = job
+            fig = create_heatmap(_grouped(position), position, min_ratio=HEATMAP_MIN_RATIO, top_n=top_n, page=page)
+            figures = {heatmap_job_path(out_dir, position, top_n, page): fig}
+        else:
+            _, _, team_id, season = job
+            report = _analysis().report(team_id, [season] if season else None)
+            figures = {team_job_path(out_dir, team_id, season, name): fig for name, fig in report.items()}
+    except ValueError as e:  # e.g. a team without matches in that season
+        return job, [], time.perf_counter() - start, str(e)
+
+    for path, fig in figures.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_figure(fig, path)
+    return job, list(figures), time.perf_counter() - start, None
+
+
+def plan_jobs(out_dir, grouped, teams, seasons, top_n=HEATMAP_TOP_N):
+    """Every heatmap page of the ``grouped`` players and every (team, season) report.
+
+    ``grouped`` maps each position to the frame its workers render, so no
+    page past the last one is planned.
+    """
+    jobs = []
+    for position, df in grouped.items():
+        for page in range(page_count(len(heatmap_frame(df, position, min_ratio=HEATMAP_MIN_RATIO)), top_n)):
+            jobs.append(("heatmap", out_dir, position, top_n, page))
+    for team_id in teams:
+        for season in seasons:
+            jobs.append(("team", out_dir, int(team_id), season))
+    return jobs
+
+
+def render_all(out_dir=OUT_DIR, positions=None, teams=None, seasons=None, jobs=None, data_dir=DATA_DIR):
+    """Render the catalogue into ``out_dir`` and write its manifest.
+
+    ``teams=None`` means every team with matches, ``teams=()`` none;
+    ``seasons`` lists the seasons per team, ``None`` standing for all seasons.
+    """
+    positions = list(POSITION_ATTRIBUTES if positions is None else positions)
+    analysis = None
+    if teams is None or len(teams):
+        analysis = get_analysis()
+        if teams is None:
+            teams = [team_id for team_id, _ in analysis.teams()]
+        seasons = [None] + SEASONS if seasons is None else seasons
+
+    manifest = {"figures": [], "skipped": []}
+    shared = tempfile.mkdtemp(prefix="batch_render-")
+    try:
+        with stage("batch_render.export"):
+            export_shared(shared, positions, analysis)
+        grouped = {position: load_columns(os.path.join(shared, "grouped", position)) for position in positions}
+        planned = plan_jobs(out_dir, grouped, teams or [], seasons or [])
+        with stage("batch_render.render", jobs=len(planned)) as record:
+            with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(shared, cube_path(data_dir))) as pool:
+                chunksize = max(1, len(planned) // ((jobs or os.cpu_count() or 1) * 8))
+                for job, paths, seconds, error in pool.map(render_job, planned, chunksize=chunksize):
+                    if error:
+                        manifest["skipped"].append({"job": list(job[2:]), "reason": error})
+                    else:
+                        manifest["figures"].extend(
+                            {"job": list(job[2:]), "path": os.path.relpath(p, out_dir), "seconds": round(seconds, 4)}
+                            for p in paths
+                        )
+            record["figures"] = len(manifest["figures"])
+    finally:
+        shutil.rmtree(shared, ignore_errors=True)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--positions", nargs="*", choices=list(POSITION_ATTRIBUTES))
+    parser.add_argument("--teams", type=int, nargs="*", help="team_api_ids (default: all; none to skip)")
+    parser.add_argument("--all-seasons-only", action="store_true", help="one report per team over all seasons")
+    args = parser.parse_args()
+
+    configure_logging()
+    result = render_all(
+        args.out,
+        positions=args.positions,
+        teams=args.teams,
+        seasons=[None] if args.all_seasons_only else None,
+        jobs=args.jobs,
+    )
+    print(f"{len(result['figures'])} figures written to {args.out}, {len(result['skipped'])} jobs skipped")
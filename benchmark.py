@@ -0,0 +1,387 @@
+"""Benchmarks for the figure pipeline stages and the Dash callbacks.
+
+Synthetic Match / Player_Attributes tables are generated at multiples of
+the real table sizes and every stage is timed on them, reporting wall time,
+rows per second and peak traced memory. Results can be saved as a baseline
+and later runs compared against it.
+
+The match_points, lineup_join and swarm_layout stages time the vectorised
+replacements (results.py, lineups.py, swarm.py). ``--reference`` also times
+the implementations they replaced, on the same tables: the row-wise
+``matches.apply`` points, the 22 ``merge`` lineup join and the quadratic
+``generate_swarm_x`` loop. A legacy stage slower than ``--reference-budget``
+seconds is not run again at the larger scales.
+
+    python benchmark.py                      # scales 1 and 10
+    python benchmark.py --scales 1 10 100
+    python benchmark.py --save-baseline      # record the current numbers
+    python benchmark.py --compare            # flag stages slower than the baseline
+    python benchmark.py --reference          # also time the replaced legacy code
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from data_store import CACHE_DIRNAME, DATA_DIR
+
+# Row counts of the real tables
+REAL_SIZES = {"Match": 25_979, "Player_Attributes": 183_978, "Player": 11_060, "Team": 299}
+SEASONS = [f"{year}/{year + 1}" for year in range(2008, 2016)]
+LEAGUES = [1, 1729, 4769, 7809, 10257, 13274, 15722, 17642, 19694, 21518, 24558]
+ATTRIBUTE_COLUMNS = [
+    "crossing", "finishing", "heading_accuracy", "short_passing", "volleys", "dribbling",
+    "curve", "free_kick_accuracy", "long_passing", "ball_control", "acceleration",
+    "sprint_speed", "agility", "reactions", "balance", "shot_power", "jumping", "stamina",
+    "strength", "long_shots", "aggression", "interceptions", "positioning", "vision",
+    "penalties", "marking", "standing_tackle", "sliding_tackle", "gk_diving",
+    "gk_handling", "gk_kicking", "gk_positioning", "gk_reflexes",
+]
+# Y coordinates of a 4-4-2 line-up, goalkeeper first
+FORMATION_Y = [1, 3, 3, 3, 3, 7, 7, 7, 7, 10, 10]
+
+BASELINE_FILE = os.path.join(DATA_DIR, CACHE_DIRNAME, "benchmark_baseline.json")
+
+
+def synthetic_players(n, rng):
+    ids = np.arange(1, n + 1) * 7 + 2_000
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "player_api_id": ids,
+        "player_name": [f"Player {i}" for i in ids],
+        "player_fifa_api_id": ids + 100_000,
+        "birthday": pd.to_datetime("1980-01-01") + pd.to_timedelta(rng.integers(0, 7_000, n), unit="D"),
+        "height": rng.normal(181, 6, n).round(2),
+        "weight": rng.integers(140, 200, n),
+    })
+
+
+def synthetic_matches(n, team_ids, player_ids, rng):
+    team_league = dict(zip(team_ids, rng.choice(LEAGUES, len(team_ids))))
+    home = rng.choice(team_ids, n)
+    away = rng.choice(team_ids, n)
+    season = rng.integers(0, len(SEASONS), n)
+    df = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "country_id": [team_league[t] for t in home],
+        "league_id": [team_league[t] for t in home],
+        "season": np.array(SEASONS)[season],
+        "stage": rng.integers(1, 39, n),
+        "date": pd.to_datetime("2008-08-01") + pd.to_timedelta(season * 365 + rng.integers(0, 300, n), unit="D"),
+        "match_api_id": np.arange(1, n + 1) + 400_000,
+        "home_team_api_id": home,
+        "away_team_api_id": away,
+        "home_team_goal": rng.poisson(1.5, n),
+        "away_team_goal": rng.poisson(1.1, n),
+    })
+    columns = {}
+    for side in ("home", "away"):
+        for slot in range(1, 12):
+            columns[f"{side}_player_X{slot}"] = np.full(n, slot)
+        for slot, y in enumerate(FORMATION_Y, start=1):
+            columns[f"{side}_player_Y{slot}"] = np.full(n, y)
+    for side in ("home", "away"):
+        for slot in range(1, 12):
+            ids = rng.choice(player_ids, n).astype("float64")
+            ids[rng.random(n) < 0.05] = np.nan
+            columns[f"{side}_player_{slot}"] = ids
+    return pd.concat([df, pd.DataFrame(columns)], axis=1)
+
+
+def synthetic_player_attributes(n, player_ids, rng):
+    overall = rng.integers(45, 90, n).astype("float64")
+    df = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "player_fifa_api_id": 0,
+        "player_api_id": rng.choice(player_ids, n),
+        "date": pd.to_datetime("2007-02-22") + pd.to_timedelta(rng.integers(0, 3_400, n), unit="D"),
+        "overall_rating": overall,
+        "potential": np.minimum(99, overall + rng.integers(0, 20, n)),
+        "preferred_foot": "right",
+        "attacking_work_rate": "medium",
+        "defensive_work_rate": "medium",
+    })
+    attrs = pd.DataFrame(rng.integers(20, 95, (n, len(ATTRIBUTE_COLUMNS))).astype("float64"), columns=ATTRIBUTE_COLUMNS)
+    return pd.concat([df, attrs], axis=1)
+
+
+def synthetic_tables(scale, seed=0):
+    rng = np.random.default_rng(seed)
+    players = synthetic_players(int(REAL_SIZES["Player"] * scale), rng)
+    team_ids = np.arange(1, REAL_SIZES["Team"] + 1) * 11 + 1_000
+    return {
+        "Player": players,
+        "Match": synthetic_matches(int(REAL_SIZES["Match"] * scale), team_ids, players["player_api_id"].to_numpy(), rng),
+        "Player_Attributes": synthetic_player_attributes(
+            int(REAL_SIZES["Player_Attributes"] * scale), players["player_api_id"].to_numpy(), rng
+        ),
+        "PositionReference": pd.DataFrame({
+            "player_pos_x": 1,
+            "player_pos_y": range(1, 12),
+            "role_x": "CENTER",
+            "role_y": ["GK", "BK", "BK", "BK", "MF", "MF", "MF", "MF", "FW", "FW", "FW"],
+            "role_xy": "",
+        }),
+    }
+
+
+def measure(func, rows):
+    """Run ``func()`` once, returning its result and timing/memory stats."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        "seconds": round(seconds, 6),
+        "rows": int(rows),
+        "rows_per_second": round(rows / seconds) if seconds > 0 else None,
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def _ratings(matches):
+    from ratings import TeamRatings
+
+    ratings = TeamRatings()
+    ratings.update(matches)
+    return ratings
+
+
+# The original implementations the pipeline replaced, kept only as reference timings
+
+
+def legacy_points(matches):
+    """Row-wise ``matches.apply`` points of bar_and_violin_interactive.py before results.py."""
+    def pts(f, a):
+        return 3 if f > a else 1 if f == a else 0
+
+    matches = matches.copy()
+    matches["home_points"] = matches.apply(lambda r: pts(r.home_team_goal, r.away_team_goal), axis=1)
+    matches["away_points"] = matches.apply(lambda r: pts(r.away_team_goal, r.home_team_goal), axis=1)
+    return matches
+
+
+def legacy_lineup_join(matches, players):
+    """heatmap.py's lineup join before lineups.py: one merge with Player per home/away player column."""
+    player_cols = [col for col in matches.columns if re.fullmatch(r"(home|away)_player_\d+", col)]
+    for col in player_cols:
+        matches[col] = matches[col].astype("Int64")
+        matches = matches.merge(players, left_on=col, right_on="player_api_id", how="left",
+                                suffixes=("", f"_{col}_info"))
+        matches[f"{col}_position"] = matches[col.replace("_player_", "_player_Y")]
+    return matches
+
+
+def legacy_swarm_x(y_vals, center_x, spread=0.01, size=10):
+    """generate_swarm_x before swarm.py: rescans every placed point for each new one."""
+    x_vals = []
+    y_used = []
+    for y in y_vals:
+        nearby = [x for (x, y0) in zip(x_vals, y_used) if abs(y - y0) < size]
+        if not nearby:
+            x_vals.append(center_x)
+        else:
+            offset = spread * (len(nearby) // 2 + 1)
+            direction = -1 if len(nearby) % 2 == 0 else 1
+            x_vals.append(center_x + direction * offset)
+        y_used.append(y)
+    return x_vals
+
+
+def reference_stages(scale, skip=()):
+    """Time the legacy implementations on the same synthetic tables as ``data_stages``.
+
+    Stages named in ``skip`` are left out, e.g. those that already ran over the
+    time budget at a smaller scale.
+    """
+    tables = synthetic_tables(scale)
+    matches = tables["Match"]
+    y = np.random.default_rng(1).uniform(0, 100, len(tables["Player"]))
+    stages = {
+        "legacy.points_apply": (lambda: legacy_points(matches), len(matches)),
+        "legacy.lineup_merges": (lambda: legacy_lineup_join(matches, tables["Player"]), len(matches)),
+        "legacy.swarm_x": (lambda: legacy_swarm_x(y, center_x=0), len(y)),
+    }
+    stats = {}
+    for name, (func, rows) in stages.items():
+        if name not in skip:
+            _, stats[name] = measure(func, rows)
+    return stats
+
+
+def data_stages(scale):
+    """Time every data-pipeline stage on synthetic tables of the given scale."""
+    from data_store import load_table, read_csv_typed
+    from heatmap import create_heatmap
+    from lineups import build_lineups, player_role_index
+    from results import team_matches
+    from possession import build_possession_curves
+    from scatterplot import points_in_polygon
+    from shot_maps import KINDS as SHOT_KINDS, build_shot_maps
+    from similarity import SimilarityIndex
+    from snapshots import latest_snapshots
+    from swarm import swarm_x
+
+    tables = synthetic_tables(scale)
+    matches = tables["Match"]
+    atts = tables["Player_Attributes"]
+    stats = {}
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        for name, df in tables.items():
+            df.to_csv(os.path.join(data_dir, f"{name}.csv"), index=False)
+        for name in ("Match", "Player_Attributes"):
+            n = len(tables[name])
+            _, stats[f"csv_load[{name}]"] = measure(lambda: read_csv_typed(name, data_dir=data_dir), n)
+            _, stats[f"cache_build[{name}]"] = measure(lambda: load_table(name, data_dir=data_dir), n)
+            _, stats[f"cache_load[{name}]"] = measure(lambda: load_table(name, data_dir=data_dir), n)
+
+    _, stats["match_points"] = measure(lambda: team_matches(matches), len(matches))
+    lineups, stats["lineup_join"] = measure(lambda: build_lineups(matches, tables["Player"]), len(matches))
+    _, stats["role_index"] = measure(lambda: player_role_index(lineups, tables["PositionReference"]), len(lineups))
+    latest, stats["latest_snapshot"] = measure(lambda: latest_snapshots(atts), len(atts))
+
+    rng = np.random.default_rng(1)
+    y = rng.uniform(0, 100, len(latest))
+    _, stats["swarm_layout"] = measure(lambda: swarm_x(y, center_x=0), len(y))
+
+    # A 300-vertex lasso over every player's (age, potential) point
+    points = np.column_stack([rng.uniform(16, 24, len(latest)), latest["potential"].to_numpy(dtype=float)])
+    angles = np.linspace(0, 2 * np.pi, 300, endpoint=False)
+    lasso = np.column_stack([20 + 3 * np.cos(angles), 80 + 10 * np.sin(angles)])
+    _, stats["brush_select"] = measure(lambda: points_in_polygon(points, lasso), len(points))
+
+    # Shot/goal positions, split over the three event tables like the real ~190k events
+    n_events = int(190_000 * scale)
+    home = matches["home_team_api_id"].to_numpy()
+    pick = rng.integers(0, len(matches), n_events)
+    shots = pd.DataFrame({
+        "match_id": matches["id"].to_numpy()[pick],
+        "team": home[pick],
+        "pos_x": rng.integers(1, 46, n_events).astype("float64"),
+        "pos_y": rng.integers(1, 70, n_events).astype("float64"),
+    })
+    bounds = np.linspace(0, n_events, len(SHOT_KINDS) + 1).astype(int)
+    events = {kind: shots.iloc[lo:hi] for kind, lo, hi in zip(SHOT_KINDS, bounds, bounds[1:])}
+    _, stats["shot_binning"] = measure(
+        lambda: build_shot_maps(events, matches.set_index("id")["season"]), n_events
+    )
+
+    # Four running possession readings per match, resampled onto the minute grid and averaged per team
+    n_samples = len(matches) * 4
+    samples = pd.DataFrame({
+        "match_id": np.repeat(matches["id"].to_numpy(), 4),
+        "elapsed": np.tile([25, 45, 70, 90], len(matches)),
+        "elapsed_plus": np.nan,
+        "homepos": rng.integers(30, 70, n_samples).astype("float64"),
+    }).assign(awaypos=lambda df: 100 - df["homepos"])
+    _, stats["possession_curves"] = measure(lambda: build_possession_curves(matches, samples), n_samples)
+
+    # Elo/form over the whole history, then one week of new matches on top of it
+    dates = pd.to_datetime(matches["date"])
+    cut = dates.max() - pd.Timedelta(days=7)
+    ratings, stats["elo_full"] = measure(lambda: _ratings(matches[dates <= cut]), int((dates <= cut).sum()))
+    _, stats["elo_incremental"] = measure(lambda: ratings.update(matches), int((dates > cut).sum()))
+
+    # k-NN index over every player's forward attributes, then 100 "similar players" lookups
+    index, stats["similarity_index"] = measure(lambda: SimilarityIndex.from_frame("fw", latest), len(latest))
+    probes = index.player_ids[:: max(1, len(index) // 100)][:100]
+    _, stats["similarity_query"] = measure(lambda: [index.similar(p) for p in probes], len(probes))
+
+    grouped = latest.assign(
+        player_name=latest["player_api_id"].astype(str),
+        potential_rating_ratio=latest["potential"] / latest["overall_rating"] * 100,
+    ).head(int(1_600 * scale))
+    create_heatmap(grouped.head(10), "fw")  # keep plotly's first-use setup out of the timing
+    _, stats["create_heatmap"] = measure(lambda: create_heatmap(grouped, "fw"), len(grouped))
+    return stats
+
+
+def app_stages():
+    """Time the Dash callbacks per tab; needs the repository's figures and grouped data."""
+    import app
+
+    stats = {}
+    for tab in ("tab-1", "tab-2", "tab-3"):
+        _, stats[f"render_content[{tab}]"] = measure(lambda: app.render_content(tab), 1)
+    app.figure_cache.clear()
+    _, stats["update_heatmaps[cold]"] = measure(lambda: app.update_heatmaps(25, 100, None, 1, None), 1)
+    _, stats["update_heatmaps[cached]"] = measure(lambda: app.update_heatmaps(25, 100, None, 1, None), 1)
+    _, stats["update_team_report[default]"] = measure(lambda: app.update_team_report(app.TEAM_ID, None), 1)
+    return stats
+
+
+def compare(results, baseline, tolerance):
+    """Stages whose time grew by more than ``tolerance`` over the baseline."""
+    regressions = []
+    for group, stages in results.items():
+        for stage, stat in stages.items():
+            base = baseline.get(group, {}).get(stage)
+            if base and stat["seconds"] > base["seconds"] * (1 + tolerance):
+                regressions.append((group, stage, base["seconds"], stat["seconds"]))
+    return regressions
+
+
+def print_results(results):
+    print(f"{'group':<10} {'stage':<32} {'seconds':>10} {'rows/s':>14} {'peak MB':>10}")
+    for group, stages in results.items():
+        for stage, stat in stages.items():
+            rate = f"{stat['rows_per_second']:,}" if stat["rows_per_second"] else "-"
+            print(f"{group:<10} {stage:<32} {stat['seconds']:>10.4f} {rate:>14} {stat['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10])
+    parser.add_argument("--skip-app", action="store_true", help="don't time the Dash callbacks")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--reference", action="store_true",
+                        help="also time the legacy implementations the pipeline replaced")
+    parser.add_argument("--reference-budget", type=float, default=60,
+                        help="seconds after which a legacy stage is not run at larger scales")
+    args = parser.parse_args()
+    if args.compare and not args.save_baseline and not os.path.exists(args.baseline):
+        sys.exit(f"No baseline at {args.baseline}; run with --save-baseline first")
+
+    results = {}
+    over_budget = {}
+    for scale in sorted(args.scales):
+        results[f"{scale:g}x"] = data_stages(scale)
+        if args.reference:
+            legacy = reference_stages(scale, skip=over_budget)
+            results[f"{scale:g}x"].update(legacy)
+            over_budget.update({name: f"{scale:g}x" for name, stat in legacy.items()
+                                if stat["seconds"] > args.reference_budget})
+    if not args.skip_app:
+        results["app"] = app_stages()
+    print_results(results)
+    for name, scale in over_budget.items():
+        print(f"{name} took over {args.reference_budget:g}s at {scale}; not run at larger scales")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"Baseline saved to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for group, stage, before, after in regressions:
+            print(f"REGRESSION {group} {stage}: {before:.4f}s -> {after:.4f}s")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,226 @@
+"""Shared loader for the CSV tables in data/.
+
+Every table is parsed from CSV once, typed, and written as Parquet to
+data/.cache/. Later loads read only the requested columns from the Parquet
+copy. A small manifest next to each Parquet file records the source CSV's
+mtime, size and sha256 so the copy is rebuilt when the CSV changes.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:  # fall back to plain CSV parsing
+    HAS_PYARROW = False
+
+DATA_DIR = os.environ.get("VDS_DATA_DIR", "data")
+CACHE_DIRNAME = ".cache"
+
+# Columns parsed as datetimes when a table is converted
+DATE_COLUMNS = {
+    "Match": ["date"],
+    "Player": ["birthday"],
+    "Player_Attributes": ["date"],
+    "Team_Attributes": ["date"],
+}
+
+# Raw XML event columns in Match.csv; the Match_*.csv tables hold the same events
+DROP_COLUMNS = {
+    "Match": [
+        "goal", "shoton", "shotoff", "foulcommit", "card", "cross", "corner", "possession"
+    ],
+}
+
+
+def csv_path(name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{name}.csv")
+
+
+def cache_path(name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, CACHE_DIRNAME, f"{name}.parquet")
+
+
+def _manifest_path(name, data_dir):
+    return os.path.join(data_dir, CACHE_DIRNAME, f"{name}.json")
+
+
+def _file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_state(path):
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _read_manifest(name, data_dir):
+    try:
+        with open(_manifest_path(name, data_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(name, data_dir, manifest):
+    path = _manifest_path(name, data_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def _downcast(df):
+    # Ids and counts fit in int32; floats stay float64 so derived ratios don't change
+    for col in df.select_dtypes(include="int64").columns:
+        values = df[col]
+        if values.empty or (values.min() >= -2**31 and values.max() < 2**31):
+            df[col] = values.astype("int32")
+    return df
+
+
+def read_csv_typed(name, columns=None, data_dir=DATA_DIR):
+    """Parse a CSV table directly, applying the same typing as the cache."""
+    path = csv_path(name, data_dir)
+    drop = set(DROP_COLUMNS.get(name, []))
+    if columns is None:
+        usecols = lambda col: col not in drop  # noqa: E731
+    else:
+        usecols = list(columns)
+    df = pd.read_csv(path, usecols=usecols, low_memory=False)
+    for col in DATE_COLUMNS.get(name, []):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    if columns is not None:
+        df = df[list(columns)]
+    return _downcast(df)
+
+
+def is_fresh(name, data_dir=DATA_DIR):
+    """True if the cached copy of ``name`` matches its source CSV."""
+    if not os.path.exists(cache_path(name, data_dir)):
+        return False
+    manifest = _read_manifest(name, data_dir)
+    if manifest is None:
+        return False
+
+    source = csv_path(name, data_dir)
+    state = _source_state(source)
+    if state["mtime_ns"] == manifest["mtime_ns"] and state["size"] == manifest["size"]:
+        return True
+
+    # mtime/size moved (e.g. a fresh checkout): only rebuild if the content changed
+    if state["size"] == manifest["size"] and _file_hash(source) == manifest["sha256"]:
+        manifest.update(state)
+        _write_manifest(name, data_dir, manifest)
+        return True
+    return False
+
+
+def build_table(name, data_dir=DATA_DIR):
+    """Convert ``data/<name>.csv`` into its typed Parquet copy."""
+    source = csv_path(name, data_dir)
+    state = _source_state(source)
+    df = read_csv_typed(name, data_dir=data_dir)
+
+    os.makedirs(os.path.join(data_dir, CACHE_DIRNAME), exist_ok=True)
+    target = cache_path(name, data_dir)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+
+    _write_manifest(name, data_dir, {**state, "sha256": _file_hash(source), "columns": list(df.columns)})
+    return df
+
+
+def load_table(name, columns=None, data_dir=DATA_DIR):
+    """Load a table from data/, reading only ``columns`` when given.
+
+    Falls back to parsing the CSV when pyarrow isn't installed.
+    """
+    if not HAS_PYARROW:
+        return read_csv_typed(name, columns, data_dir)
+
+    if not is_fresh(name, data_dir):
+        df = build_table(name, data_dir)
+        return df if columns is None else df[list(columns)].copy()
+    return pd.read_parquet(cache_path(name, data_dir), columns=None if columns is None else list(columns))
+
+
+def iter_table(name, columns, chunksize=100_000, data_dir=DATA_DIR):
+    """Yield ``columns`` of a table in chunks of at most ``chunksize`` rows.
+
+    Reads the Parquet copy batch by batch when it is up to date; otherwise
+    streams the CSV without building the cache, so memory stays bounded.
+    """
+    columns = list(columns)
+    if HAS_PYARROW and is_fresh(name, data_dir):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(cache_path(name, data_dir))
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    for chunk in pd.read_csv(csv_path(name, data_dir), usecols=columns, chunksize=chunksize):
+        for col in DATE_COLUMNS.get(name, []):
+            if col in chunk.columns:
+                chunk[col] = pd.to_datetime(chunk[col], errors="coerce")
+        yield _downcast(chunk[columns])
+
+
+def source_hashes(sources, data_dir=DATA_DIR):
+    """Content hashes of the ``sources`` CSVs, taken from the manifests when fresh."""
+    hashes = {}
+    for source in sources:
+        if is_fresh(source, data_dir):
+            hashes[source] = _read_manifest(source, data_dir)["sha256"]
+        else:
+            hashes[source] = _file_hash(csv_path(source, data_dir))
+    return hashes
+
+
+def load_derived(name, sources, build, columns=None, data_dir=DATA_DIR):
+    """Load a table computed from other tables, caching it as Parquet.
+
+    ``build()`` is called to recompute the table whenever the content hash of
+    any of the ``sources`` tables differs from the one it was built from.
+    """
+    if not HAS_PYARROW:
+        df = build()
+        return df if columns is None else df[list(columns)]
+
+    hashes = source_hashes(sources, data_dir)
+    manifest = _read_manifest(name, data_dir)
+    target = cache_path(name, data_dir)
+    if manifest is not None and manifest.get("sources") == hashes and os.path.exists(target):
+        return pd.read_parquet(target, columns=None if columns is None else list(columns))
+
+    df = build()
+    os.makedirs(os.path.join(data_dir, CACHE_DIRNAME), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    _write_manifest(name, data_dir, {"sources": hashes, "columns": list(df.columns)})
+    return df if columns is None else df[list(columns)].copy()
+
+
+def build_all(data_dir=DATA_DIR):
+    """(Re)build the cache for every CSV table in ``data_dir``."""
+    names = sorted(f[:-4] for f in os.listdir(data_dir) if f.endswith(".csv"))
+    for name in names:
+        if not is_fresh(name, data_dir):
+            build_table(name, data_dir)
+    return names
+
+
+if __name__ == "__main__":
+    for table in build_all():
+        print(f"{table}: {cache_path(table)}")
@@ -0,0 +1,59 @@
+"""Streaming per-team event counts from the Match_* event tables.
+
+Each event table is read in chunks of ``match_id``/``team`` only and folded
+into a running (match, team) count, so memory is bounded by the number of
+team-matches rather than the number of events.
+"""
+import pandas as pd
+
+from data_store import DATA_DIR, iter_table
+
+EVENT_TABLES = {
+    "shots_on": "Match_Shots_On",
+    "shots_off": "Match_Shots_Off",
+    "corners": "Match_Corner",
+    "cards": "Match_Cards",
+    "goals": "Match_Goals",
+}
+KEYS = ["match_id", "team"]
+
+
+def count_events(table, chunksize=100_000, data_dir=DATA_DIR):
+    """Number of events per (match_id, team) in one event table."""
+    counts = None
+    for chunk in iter_table(table, KEYS, chunksize=chunksize, data_dir=data_dir):
+        chunk_counts = chunk.dropna(subset=KEYS).astype("int64").groupby(KEYS).size()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+    if counts is None:
+        return pd.Series(dtype="int64", index=pd.MultiIndex.from_arrays([[], []], names=KEYS))
+    return counts.astype("int64")
+
+
+def event_counts(tables=EVENT_TABLES, chunksize=100_000, data_dir=DATA_DIR):
+    """(match_id, team) x event type count table over all ``tables``.
+
+    A team-match missing from one table gets 0 there when the table has other
+    events of that match, and NaN when the table does not cover the match.
+    """
+    columns = {
+        kind: count_events(table, chunksize, data_dir) for kind, table in tables.items()
+    }
+    counts = pd.DataFrame(columns)
+    counts.index.names = KEYS
+    return covered_counts(counts, counts.index)
+
+
+def covered_counts(counts, pairs):
+    """``counts`` over the (match_id, team) ``pairs``, covered per event type.
+
+    Each column is 0 for a pair without events in a match that column's table
+    covers (has any event of) and NaN for a match it does not cover, so
+    averages of one event type skip the matches only the other tables have.
+    """
+    result = counts.reindex(pairs)
+    match_ids = pairs.get_level_values("match_id")
+    for kind in counts:
+        covered = counts[kind].dropna().index.unique("match_id")
+        result[kind] = result[kind].fillna(0).where(match_ids.isin(covered))
+    return result
+
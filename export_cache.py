@@ -0,0 +1,127 @@
+"""Content-addressed cache of static figure exports (HTML, PNG, SVG, PDF).
+
+An export is keyed on the sha256 of the figure's canonical JSON plus the
+render options, so the same figure is only rendered once per format no
+matter which page asked for it. HTML is standalone (plotly.js inlined);
+PNG/SVG/PDF need the optional ``kaleido`` package. The cache is trimmed to
+``max_bytes``, dropping the least recently used exports first.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from data_store import CACHE_DIRNAME, DATA_DIR
+
+try:
+    import kaleido  # noqa: F401
+    HAS_KALEIDO = True
+except ImportError:
+    HAS_KALEIDO = False
+
+EXPORT_DIR = os.environ.get("VDS_EXPORT_DIR", os.path.join(DATA_DIR, CACHE_DIRNAME, "exports"))
+MAX_BYTES = 512 * 2**20
+FORMATS = {
+    "html": "text/html",
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "pdf": "application/pdf",
+}
+
+
+def figure_key(figure, fmt, **options):
+    """sha256 of the figure JSON, the format and the render options."""
+    if hasattr(figure, "to_plotly_json"):
+        figure = figure.to_plotly_json()
+    payload = pio.json.to_json_plotly({"figure": figure, "format": fmt, "options": options})
+    # Re-serialise with sorted keys so equal figures hash equal regardless of key order
+    canonical = json.dumps(json.loads(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def render(figure, fmt, width=None, height=None, scale=None):
+    """Bytes of ``figure`` exported as ``fmt``."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    fig = figure if isinstance(figure, go.Figure) else go.Figure(figure)
+    if fmt == "html":
+        return pio.to_html(fig, full_html=True, include_plotlyjs=True, default_width=width or "100%",
+                           default_height=height or "100%").encode("utf-8")
+    if not HAS_KALEIDO:
+        raise RuntimeError(f"Exporting {fmt} needs the kaleido package")
+    return pio.to_image(fig, format=fmt, width=width, height=height, scale=scale)
+
+
+class ExportCache:
+    """Rendered exports on disk under ``directory``, at most ``max_bytes`` in total."""
+
+    def __init__(self, directory=EXPORT_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key, fmt):
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def get(self, figure, fmt="html", **options):
+        """Path of the export of ``figure`` as ``fmt``, rendering it on a miss."""
+        key = figure_key(figure, fmt, **options)
+        path = self.path(key, fmt)
+        if os.path.exists(path):
+            os.utime(path)  # mark as recently used for eviction
+            self.hits += 1
+            return path
+
+        data = render(figure, fmt, **options)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.misses += 1
+        self.evict(keep=path)
+        return path
+
+    def entries(self):
+        """``(mtime, size, path)`` of every cached export."""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, stat.st_size, path))
+        return found
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Delete the least recently used exports (but not ``keep``) until the cache fits ``max_bytes``."""
+        with self._lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self.entries():
+                os.remove(path)
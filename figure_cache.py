@@ -0,0 +1,61 @@
+"""In-process LRU cache for prebuilt figure dicts used by the Dash app."""
+import os
+import threading
+from collections import OrderedDict
+
+from figure_store import encode_arrays
+
+
+def data_version(*paths):
+    """Cheap version stamp for the files a figure is built from."""
+    stamps = []
+    for path in paths:
+        stat = os.stat(path)
+        stamps.append(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    return "/".join(stamps)
+
+
+class FigureCache:
+    """Figure dicts keyed by e.g. ``(position, data_version)``, evicting the least recently used."""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, builder):
+        """Return the cached figure for ``key``, calling ``builder()`` on a miss."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        figure = builder()
+        if hasattr(figure, "to_dict"):
+            figure = encode_arrays(figure)
+
+        with self._lock:
+            self.misses += 1
+            self._items[key] = figure
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return figure
+
+    def warm(self, entries):
+        """Prebuild figures from ``(key, builder)`` pairs, e.g. at app startup."""
+        for key, builder in entries:
+            self.get(key, builder)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1,140 @@
+"""Compact storage and transfer of plotly figures.
+
+Numeric trace arrays are stored as plotly's base64 typed arrays
+(``{"dtype": "f8", "bdata": ..., "shape": ...}``) instead of JSON number
+lists, and figure files are gzipped (``figures/*.json.gz``).
+``compress_responses`` gzips (or brotli-compresses, when the ``brotli``
+package is installed) the Dash server's responses.
+"""
+import base64
+import gzip
+import io
+import json
+import os
+
+import numpy as np
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# Trace attributes plotly.js accepts as typed arrays
+ARRAY_KEYS = ("x", "y", "z", "base", "customdata")
+# Shorter arrays are smaller as plain JSON
+MIN_LENGTH = 8
+INT_DTYPES = ("i1", "u1", "i2", "u2", "i4", "u4")
+COMPRESSED_TYPES = ("application/json", "application/javascript", "text/")
+
+
+def typed_array(values):
+    """Typed-array spec for a numeric list/array, or None when it isn't one or wouldn't be smaller."""
+    try:
+        arr = np.asarray(values)
+    except ValueError:  # ragged nested lists
+        return None
+    if arr.dtype == object:
+        try:
+            arr = arr.astype("f8")  # None -> NaN, which plotly also treats as a gap
+        except (TypeError, ValueError):
+            return None
+    if arr.dtype.kind not in "iuf" or arr.size < MIN_LENGTH or arr.ndim > 2:
+        return None
+
+    # Whole-valued floats (e.g. ratings read as float64) fit the integer types
+    if arr.dtype.kind == "f" and np.isfinite(arr).all() and (arr == np.round(arr)).all():
+        arr = arr.astype("i8")
+    if arr.dtype.kind in "iu":
+        lo, hi = arr.min(), arr.max()
+        dtype = next((d for d in INT_DTYPES if np.iinfo(d).min <= lo and hi <= np.iinfo(d).max), "f8")
+    else:
+        dtype = "f8"
+    spec = {
+        "dtype": dtype,
+        "bdata": base64.b64encode(np.ascontiguousarray(arr, dtype=dtype).tobytes()).decode("ascii"),
+    }
+    if arr.ndim == 2:
+        spec["shape"] = f"{arr.shape[0]}, {arr.shape[1]}"
+    # Short decimals like 0.01 are smaller as text than as 8-byte doubles
+    if len(json.dumps(spec)) >= len(json.dumps(arr.tolist(), separators=(",", ":"))):
+        return None
+    return spec
+
+
+def encode_arrays(figure):
+    """Figure dict with the numeric trace arrays replaced by typed arrays."""
+    if hasattr(figure, "to_dict"):
+        figure = figure.to_dict()
+    traces = []
+    for trace in figure.get("data", []):
+        trace = dict(trace)
+        for key in ARRAY_KEYS:
+            value = trace.get(key)
+            if isinstance(value, (list, tuple, np.ndarray)):
+                trace[key] = typed_array(value) or value
+        traces.append(trace)
+    return dict(figure, data=traces)
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def save_figure(figure, path):
+    """Write a figure as typed-array JSON, gzipped when ``path`` ends in .gz."""
+    data = json.dumps(encode_arrays(figure), separators=(",", ":"), default=_default).encode("utf-8")
+    if path.endswith(".gz"):
+        data = gzip.compress(data, mtime=0)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_figure(path):
+    """Figure dict from a .json or .json.gz file."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _compress(data, accept):
+    if HAS_BROTLI and "br" in accept:
+        return "br", brotli.compress(data, quality=5)
+    if "gzip" in accept:
+        buf = io.BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=6, mtime=0) as f:
+            f.write(data)
+        return "gzip", buf.getvalue()
+    return None, data
+
+
+def compress_responses(server, min_size=1024):
+    """Compress a Flask server's text/JSON responses for clients that accept it."""
+    from flask import request
+
+    @server.after_request
+    def compress(response):
+        if (
+            response.direct_passthrough
+            or response.status_code < 200
+            or response.status_code >= 300
+            or "Content-Encoding" in response.headers
+            or not (response.mimetype or "").startswith(COMPRESSED_TYPES)
+        ):
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        encoding, body = _compress(data, request.headers.get("Accept-Encoding", ""))
+        if encoding:
+            response.set_data(body)
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Content-Length"] = str(len(body))
+        response.vary.add("Accept-Encoding")
+        return response
@@ -0,0 +1,27 @@
+"""Gunicorn settings for serving wsgi.py:
+
+    gunicorn -c gunicorn.conf.py wsgi:server
+
+``VDS_BIND``, ``VDS_WORKERS`` and ``VDS_THREADS`` override the defaults below.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("VDS_BIND", "0.0.0.0:8050")
+# Load the data and figures once in the master and fork the workers from it
+preload_app = True
+workers = int(os.environ.get("VDS_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Callbacks mostly wait on NumPy and the figure cache, so a few threads per worker share its memory
+worker_class = "gthread"
+threads = int(os.environ.get("VDS_THREADS", 4))
+# Cold exports and the first ratings build can take a while
+timeout = 120
+keepalive = 5
+accesslog = os.environ.get("VDS_ACCESS_LOG")
+
+
+def when_ready(server):
+    # wsgi.py froze the preloaded objects; freeze again for anything gunicorn allocated since
+    gc.freeze()
+    server.log.info("Preloaded %d objects shared with the workers", gc.get_freeze_count())
@@ -1,153 +1,90 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import numpy as np
+import os
 import plotly.graph_objects as go
-import re
-from collections import defaultdict
 import plotly.io as pio
+from instrumentation import configure_logging, instrument, stage
 
-players = pd.read_csv('data/Player.csv')
-player_atts = pd.read_csv('data/Player_Attributes.csv')
-teams = pd.read_csv('data/Team.csv')
-matches = pd.read_csv('data/Match.csv')
-leagues = pd.read_csv('data/League.csv')
-positions = pd.read_csv('data/PositionReference.csv')
+GROUPED_DIR = 'grouped_players'
+PROMISING_IDS = 'data/promising_ids.txt'
 
-player_atts['potential_rating_ratio'] = ((player_atts['potential'] / player_atts['overall_rating']) * 100)
-
-teams[teams['team_long_name']=='RCD Espanyol']
-
-matches['date'] = pd.to_datetime(matches['date'])
-rcde_matches = matches[matches['home_team_api_id']== 8558]
-
-filtered_players_rcde = [col for col in rcde_matches.columns if re.match(r'home_player_\d+$', col)]
-
-# add player name column
-player_atts = player_atts.merge(players[['player_api_id', 'player_name']], on='player_api_id', how='left')
-
-# From the scatterplot
-with open("data/promising_names.txt", "r") as f:
-    promising_names = [line.strip() for line in f]
-
-# Retain the most promising players
-promising_players = player_atts[player_atts['player_name'].isin(promising_names)]
-
-player_cols = [col for col in matches.columns if re.fullmatch(r'home_player_\d+', col) or re.fullmatch(r'away_player_\d+', col)]
-
-for col in player_cols:
-    # Find the corresponding Y column
-    y_col = col.replace('home_player_', 'home_player_Y')
-    y_col_away = col.replace('away_player_', 'away_player_Y')
-
-    matches[col] = matches[col].astype('Int64')
-
-    # Merge with players table
-    matches = matches.merge(
-        players,
-        left_on=col,
-        right_on='player_api_id',
-        how='left',
-        suffixes=('', f'_{col}_info')
-    )
-
-    matches[f'{col}_position'] = matches[y_col]
-
-relevant_columns = [col for col in matches.columns if (
-    ("home_player" in col or "away_player" in col) and
-    ("_position" in col or "player_api_id" in col or "player_name" in col)
-)]
-
-players_filtered = matches[relevant_columns]
-
-name_cols = [col for col in players_filtered.columns if 'player_name_home_player_' in col or 'player_name_away_player_' in col]
-pos_cols = [col for col in players_filtered.columns if re.fullmatch(r'home_player_\d+_position', col) or re.fullmatch(r'away_player_\d+_position', col)]
+# Attributes shown on each position's heatmap
+POSITION_ATTRIBUTES = {
+    'bk': [
+        "marking", "standing_tackle", "sliding_tackle", "interceptions", "strength",
+        "stamina", "aggression", "jumping", "heading_accuracy", "short_passing",
+        "reactions", "vision"
+    ],
+    'mf': [
+        "short_passing", "long_passing", "ball_control", "vision", "dribbling",
+        "interceptions", "stamina", "reactions", "positioning", "aggression",
+        "shot_power", "curve", "free_kick_accuracy", "standing_tackle", "sliding_tackle"
+    ],
+    'fw': [
+        "finishing", "shot_power", "positioning", "dribbling", "acceleration",
+        "sprint_speed", "ball_control", "volleys", "heading_accuracy", "agility",
+        "reactions", "penalties", "curve"
+    ],
+}
 
-player_position_dict = {}
 
-for name_col in name_cols:
-    match = re.search(r'(home|away)_player_(\d+)', name_col)
-    if not match:
-        continue
-    prefix, player_number = match.groups()
-    pos_col = f'{prefix}_player_{player_number}_position'
+def player_labels(df):
+    """Row labels: the player name, plus the id where players share a name."""
+    if 'player_api_id' not in df:
+        return df['player_name']
+    ids_per_name = df.groupby('player_name')['player_api_id'].transform('nunique')
+    shared = ids_per_name > 1
+    labels = df['player_name'].copy()
+    labels[shared] = df['player_name'][shared] + ' (#' + df['player_api_id'][shared].astype('int64').astype(str) + ')'
+    return labels
 
-    if pos_col not in players_filtered.columns:
-        print(f"Warning: {pos_col} not found in columns.")
-        continue
 
-    for name, pos in zip(players_filtered[name_col], players_filtered[pos_col]):
-        if pd.notna(name) and pd.notna(pos) and pos<12:
-            player_position_dict[name] = int(pos)
+def shown_attributes(position, attributes=None):
+    """The position's heatmap attributes that are in ``attributes`` (all of them when empty)."""
+    if position not in POSITION_ATTRIBUTES:
+        raise ValueError("Position incorrect")
+    if not attributes:
+        return list(POSITION_ATTRIBUTES[position])
+    return [a for a in POSITION_ATTRIBUTES[position] if a in attributes]
 
-player_position_dict
 
-# only get the role_y information
-pos_role_dict = {}
-for position, role in zip(positions['player_pos_y'], positions['role_y']):
-    pos_role_dict[position] = role
+def heatmap_frame(df, position, attributes=None, min_ratio=None):
+    """Player x attribute table behind a heatmap, sorted by potential ratio.
 
-# map player position numbers and map to role
-player_role_dict = {player: pos_role_dict.get(int(position), 'Unknown') for player, position in player_position_dict.items()}
+    ``attributes`` narrows the position's attribute list (an empty selection
+    keeps all of them; one without any of the position's attributes leaves no
+    rows) and ``min_ratio`` drops players below that potential ratio.
+    """
+    position_attributes = shown_attributes(position, attributes)
+    columns_to_keep = ['player_name', 'potential_rating_ratio'] + position_attributes
+    df = df.assign(player_name=player_labels(df))[columns_to_keep].dropna()
+    df['potential_rating_ratio'] = df['potential_rating_ratio'].astype(int)
+    if min_ratio is not None:
+        df = df[df['potential_rating_ratio'] >= min_ratio]
 
-player_role_dict
+    if not position_attributes:
+        df = df.iloc[:0]
 
-# sort player names per role on the soccer pitch
-roles = defaultdict(list)
-for player, role in player_role_dict.items():
-    roles[role].append(player)
+    pivot_df = df.set_index('player_name')[['potential_rating_ratio'] + position_attributes]
+    return pivot_df.sort_values(by='potential_rating_ratio', ascending=False, kind='stable')
 
-unique_roles = sorted(roles.keys())
-role_counts = {role: len(players) for role, players in roles.items()}
 
-gk_player_names = roles['GK']
-bk_player_names = roles['BK']
-mf_player_names = roles['MF']
-fw_player_names = roles['FW']
+def page_count(n_rows, top_n):
+    if not top_n:
+        return 1
+    return max(1, -(-n_rows // top_n))
 
-# initalize dataframes to base the heatmaps on
-bk_players = promising_players[promising_players['player_name'].isin(bk_player_names)]
-mf_players = promising_players[promising_players['player_name'].isin(mf_player_names)]
-fw_players = promising_players[promising_players['player_name'].isin(fw_player_names)]
 
-fw_players.to_csv("fw_players.csv", index=False)
-mf_players.to_csv("mf_players.csv", index=False)
-bk_players.to_csv("bk_players.csv", index=False)
+def create_heatmap(df, position, attributes=None, min_ratio=None, top_n=None, page=0):
+    """Heatmap of the ``page``-th block of ``top_n`` players (all players when ``top_n`` is None).
 
-pio.renderers.default = "notebook_connected"
-
-def create_heatmap(df, position):
-    bk = [
-        "marking", "standing_tackle", "sliding_tackle", "interceptions", "strength",
-        "stamina", "aggression", "jumping", "heading_accuracy", "short_passing",
-        "reactions", "vision"
-    ]
-    mf = [
-        "short_passing", "long_passing", "ball_control", "vision", "dribbling",
-        "interceptions", "stamina", "reactions", "positioning", "aggression",
-        "shot_power", "curve", "free_kick_accuracy", "standing_tackle", "sliding_tackle"
-    ]
-    fw = [
-        "finishing", "shot_power", "positioning", "dribbling", "acceleration",
-        "sprint_speed", "ball_control", "volleys", "heading_accuracy", "agility",
-        "reactions", "penalties", "curve"
-    ]
-
-    if position == 'bk':
-        attributes = bk
-    elif position == 'mf':
-        attributes = mf
-    elif position == 'fw':
-        attributes = fw
-    else:
-        raise ValueError("Position incorrect")
-
-    columns_to_keep = ['player_name', 'potential_rating_ratio'] + attributes
-    df = df[columns_to_keep].dropna()
-    df['potential_rating_ratio'] = df['potential_rating_ratio'].astype(int)
-    df = df.sort_values(by='potential_rating_ratio', ascending=False)
-
-    pivot_df = df.set_index('player_name')[['potential_rating_ratio'] + attributes]
-    pivot_df = pivot_df.sort_values(by='potential_rating_ratio', ascending=False)
+    When none of the selected ``attributes`` belong to the position, the figure
+    says so instead of showing a heatmap.
+    """
+    if not shown_attributes(position, attributes):
+        return no_attributes_figure(position)
+    pivot_df = heatmap_frame(df, position, attributes, min_ratio)
+    if top_n:
+        page = min(max(page, 0), page_count(len(pivot_df), top_n) - 1)
+        pivot_df = pivot_df.iloc[page * top_n:(page + 1) * top_n]
 
     pio.renderers.default = "notebook_connected"
 
@@ -185,6 +122,80 @@ def create_heatmap(df, position):
     return fig
 
 
-create_heatmap(fw_players, 'fw')
-create_heatmap(bk_players, 'bk')
-create_heatmap(mf_players, 'mf')
\ No newline at end of file
+def no_attributes_figure(position):
+    """Empty figure in place of a heatmap whose position has none of the selected attributes."""
+    fig = go.Figure()
+    fig.update_layout(
+        annotations=[dict(
+            text=f'None of the selected attributes<br>apply to {position.upper()} players',
+            x=0.5, y=0.5, xref='paper', yref='paper', showarrow=False, font=dict(size=16, color='grey')
+        )],
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        height=800,
+        width=800,
+        margin=dict(l=20, r=20, t=30, b=30),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+
+@instrument('heatmap.group_promising_players')
+def group_promising_players(promising_ids):
+    """Latest attributes of the promising players, split into BK/MF/FW by modal role."""
+    # Imported here so the app can import create_heatmap without the data layer
+    from data_store import load_table
+    from player_index import player_roles
+    from snapshots import latest_attributes
+
+    with stage('heatmap.load') as record:
+        players = load_table('Player', columns=['player_api_id', 'player_name'])
+        player_atts = latest_attributes()
+        record.output(players, player_atts)
+
+    player_atts['potential_rating_ratio'] = ((player_atts['potential'] / player_atts['overall_rating']) * 100)
+
+    # add player name column
+    player_atts = player_atts.merge(players, on='player_api_id', how='left')
+
+    # Retain the most promising players, by id so namesakes aren't pulled in
+    promising_players = player_atts[player_atts['player_api_id'].isin(promising_ids)]
+
+    # Each player's modal position/role from the lineups, cached between runs
+    with stage('heatmap.roles') as record:
+        roles = player_roles()
+        record.output(roles)
+
+    groups = {}
+    for position in POSITION_ATTRIBUTES:
+        role_ids = roles.index[roles['role'] == position.upper()]
+        groups[position] = promising_players[promising_players['player_api_id'].isin(role_ids)]
+    return groups
+
+
+@instrument('heatmap.write_groups')
+def write_groups(groups, out_dir=GROUPED_DIR):
+    # Write to a temp file and rename so readers never see a half-written CSV
+    os.makedirs(out_dir, exist_ok=True)
+    for position, df in groups.items():
+        path = os.path.join(out_dir, f'{position}_players.csv')
+        tmp = f'{path}.{os.getpid()}.tmp'
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+
+
+def main():
+    # From the scatterplot
+    with open(PROMISING_IDS, 'r') as f:
+        promising_ids = [int(line) for line in f if line.strip()]
+
+    groups = group_promising_players(promising_ids)
+    write_groups(groups)
+    for position, df in groups.items():
+        print(f'{position}: {len(df)} players')
+
+
+if __name__ == '__main__':
+    configure_logging()
+    main()
@@ -0,0 +1,222 @@
+"""Timing and memory instrumentation for the ETL stages and app callbacks.
+
+``stage`` (context manager) and ``instrument`` (decorator) record wall time,
+rows in/out and DataFrame memory for a block of work. Each record is logged
+as one JSON line on the ``vds.metrics`` logger and folded into ``registry``,
+which the app serves at ``/metrics``.
+
+With ``VDS_PROFILING=1`` the app also honours an ``X-Profile: cpu`` or
+``X-Profile: memory`` request header, writing a cProfile dump or the top
+tracemalloc allocations of that request to ``PROFILE_DIR``.
+"""
+import cProfile
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+log = logging.getLogger("vds.metrics")
+
+PROFILE_DIR = ".profiles"
+RECENT = 200
+
+
+def frame_rows(*objs):
+    """Total rows of the DataFrames/Series in ``objs`` (also inside dicts, lists and tuples)."""
+    frames = list(_frames(objs))
+    return sum(len(f) for f in frames) if frames else None
+
+
+def frame_memory(*objs):
+    """Total deep memory in bytes of the DataFrames/Series in ``objs``."""
+    frames = list(_frames(objs))
+    if not frames:
+        return None
+    return int(sum(
+        f.memory_usage(deep=True).sum() if isinstance(f, pd.DataFrame) else f.memory_usage(deep=True)
+        for f in frames
+    ))
+
+
+def _frames(objs):
+    for obj in objs:
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            yield obj
+        elif isinstance(obj, dict):
+            yield from _frames(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            yield from _frames(obj)
+
+
+class Registry:
+    """Per-stage aggregates and the most recent records."""
+
+    def __init__(self, recent=RECENT):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._recent = deque(maxlen=recent)
+
+    def add(self, record):
+        with self._lock:
+            self._recent.append(record)
+            stats = self._stages.setdefault(
+                record["stage"], {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            stats["count"] += 1
+            stats["errors"] += record.get("error") is not None
+            stats["total_seconds"] += record["seconds"]
+            stats["max_seconds"] = max(stats["max_seconds"], record["seconds"])
+            stats["last"] = record
+
+    def summary(self):
+        with self._lock:
+            stages = {
+                name: dict(stats, mean_seconds=stats["total_seconds"] / stats["count"])
+                for name, stats in self._stages.items()
+            }
+            return {"stages": stages, "recent": list(self._recent)}
+
+    def clear(self):
+        with self._lock:
+            self._stages.clear()
+            self._recent.clear()
+
+
+registry = Registry()
+
+
+class StageRecord(dict):
+    """Mutable record of one stage run; ``input``/``output`` take DataFrames.
+
+    The deep memory of the frames is only measured when the record will be
+    logged, as it scans every text column.
+    """
+
+    def input(self, *frames):
+        self["rows_in"] = frame_rows(*frames)
+        if log.isEnabledFor(logging.INFO):
+            self["memory_in"] = frame_memory(*frames)
+
+    def output(self, *frames):
+        self["rows_out"] = frame_rows(*frames)
+        if log.isEnabledFor(logging.INFO):
+            self["memory_out"] = frame_memory(*frames)
+
+
+@contextmanager
+def stage(name, **fields):
+    """Time the enclosed block as stage ``name``; extra ``fields`` are logged with it."""
+    record = StageRecord(stage=name, **fields)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = repr(e)
+        raise
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        record["timestamp"] = time.time()
+        registry.add(record)
+        log.info(json.dumps(record, default=str))
+
+
+def instrument(name=None, args=()):
+    """Decorator running the function as a ``stage``.
+
+    Rows and memory are taken from DataFrame arguments and the return value.
+    The values of the parameters named in ``args`` are logged too and make
+    up the stage label, e.g. ``render_content[tab-2]``.
+    """
+    def decorate(func):
+        label = name or func.__qualname__
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*a, **kw):
+            bound = signature.bind_partial(*a, **kw).arguments
+            fields = {arg: bound.get(arg) for arg in args}
+            stage_name = f"{label}[{','.join(map(str, fields.values()))}]" if args else label
+            with stage(stage_name, **fields) as record:
+                record.input(*bound.values())
+                result = func(*a, **kw)
+                record.output(result)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def configure_logging(path=None, level=logging.INFO):
+    """Send the metric records to ``path`` (default ``$VDS_METRICS_LOG``, else stderr) as JSON lines."""
+    if log.handlers:
+        return
+    path = path or os.environ.get("VDS_METRICS_LOG")
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.setLevel(level)
+    log.propagate = False
+
+
+def register_metrics(server, profile_dir=PROFILE_DIR):
+    """Add ``/metrics`` to a Flask server and, with VDS_PROFILING=1, per-request profiling."""
+    from flask import g, jsonify, request
+
+    @server.route("/metrics")
+    def metrics():
+        return jsonify(registry.summary())
+
+    if os.environ.get("VDS_PROFILING") != "1":
+        return
+
+    def request_label():
+        # Dash callbacks all POST to one URL; name them after their output
+        body = request.get_json(silent=True) if request.is_json else None
+        target = body.get("output") if isinstance(body, dict) else None
+        return (target or request.path).strip("/.").replace("/", "_").replace(".", "_")[:80] or "root"
+
+    @server.before_request
+    def start_profile():
+        mode = request.headers.get("X-Profile")
+        if mode == "cpu":
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+        elif mode == "memory" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            g.tracing = True
+
+    @server.after_request
+    def stop_profile(response):
+        profiler = g.pop("profiler", None)
+        tracing = g.pop("tracing", False)
+        if profiler is None and not tracing:
+            return response
+
+        os.makedirs(profile_dir, exist_ok=True)
+        base = os.path.join(profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{request_label()}")
+        if profiler is not None:
+            profiler.disable()
+            path = f"{base}.prof"
+            profiler.dump_stats(path)
+        else:
+            # tracemalloc is process-wide, so concurrent requests show up here too
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = f"{base}.txt"
+            with open(path, "w") as f:
+                f.write(f"peak {peak / 2**20:.1f} MB\n")
+                for stat in snapshot.statistics("lineno")[:25]:
+                    f.write(f"{stat}\n")
+        log.info(json.dumps({"profile": path, "path": request.path}))
+        response.headers["X-Profile-Output"] = path
+        return response
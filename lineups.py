@@ -0,0 +1,85 @@
+"""Long-format lineups and the player -> position/role index.
+
+Match.csv stores lineups wide: ``home_player_1..11``/``away_player_1..11``
+hold player ids and ``home_player_Y1..11``/``away_player_Y1..11`` the
+vertical pitch position of each slot. ``build_lineups`` reshapes all 22
+slots in one go and joins the Player table once.
+"""
+import numpy as np
+import pandas as pd
+
+SIDES = ("home", "away")
+SLOTS = range(1, 12)
+
+# Y coordinates above this are substitutes/unknown and carry no role
+MAX_POSITION_Y = 11
+
+
+def lineup_columns():
+    """Names of the Match columns ``build_lineups`` reads."""
+    ids = [f"{side}_player_{slot}" for side in SIDES for slot in SLOTS]
+    ys = [f"{side}_player_Y{slot}" for side in SIDES for slot in SLOTS]
+    return ids, ys
+
+
+def build_lineups(matches, players=None):
+    """One row per (match, side, slot) with the player id and Y position.
+
+    Empty slots are dropped. When ``players`` is given its ``player_name``
+    column is joined on ``player_api_id``.
+    """
+    id_cols, y_cols = lineup_columns()
+    n_slots = len(id_cols)
+
+    ids = matches[id_cols].to_numpy(dtype="float64").ravel()
+    ys = matches[y_cols].to_numpy(dtype="float64").ravel()
+    match_id = matches["id"].to_numpy() if "id" in matches else matches.index.to_numpy()
+    slot_side = np.repeat(SIDES, len(SLOTS))
+    slot_num = np.tile(np.fromiter(SLOTS, dtype="int8"), len(SIDES))
+
+    present = ~np.isnan(ids)
+    row = np.repeat(np.arange(len(matches)), n_slots)[present]
+    col = np.tile(np.arange(n_slots), len(matches))[present]
+
+    lineups = pd.DataFrame({
+        "match_id": match_id[row],
+        "side": slot_side[col],
+        "slot": slot_num[col],
+        "player_api_id": ids[present].astype("int64"),
+        "pos_y": ys[present],
+    })
+    if "date" in matches:
+        lineups["date"] = matches["date"].to_numpy()[row]
+
+    if players is not None:
+        lineups = lineups.merge(
+            players[["player_api_id", "player_name"]], on="player_api_id", how="left"
+        )
+    return lineups
+
+
+def player_role_index(lineups, positions):
+    """Modal Y position and pitch role per player, indexed by ``player_api_id``.
+
+    Ties between equally frequent positions go to the lower Y (the more
+    defensive slot), so the result doesn't depend on match order.
+    """
+    valid = lineups[lineups["pos_y"].notna() & (lineups["pos_y"] <= MAX_POSITION_Y)]
+    counts = (
+        valid.groupby(["player_api_id", "pos_y"]).size().reset_index(name="appearances")
+    )
+    modal = (
+        counts.sort_values(["player_api_id", "appearances", "pos_y"], ascending=[True, False, True])
+        .drop_duplicates("player_api_id")
+        .set_index("player_api_id")
+    )
+    modal["position"] = modal.pop("pos_y").astype(int)
+    modal["appearances"] = valid.groupby("player_api_id").size()
+
+    role_by_y = positions.drop_duplicates("player_pos_y").set_index("player_pos_y")["role_y"]
+    modal["role"] = modal["position"].map(role_by_y).fillna("Unknown")
+
+    if "player_name" in lineups:
+        names = lineups.drop_duplicates("player_api_id").set_index("player_api_id")["player_name"]
+        modal["player_name"] = names.reindex(modal.index)
+    return modal
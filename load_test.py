@@ -0,0 +1,177 @@
+"""Load test of a running app: requests per second and latency per tab.
+
+Every tab is hit in turn with the Dash callback requests a browser sends for
+it (rendering the tab, then its figure callbacks), cycling through a few
+input variants, from ``--concurrency`` threads for ``--duration`` seconds.
+
+    gunicorn -c gunicorn.conf.py wsgi:server &
+    python load_test.py --url http://127.0.0.1:8050 --concurrency 16 --duration 20
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+CALLBACK_PATH = "/_dash-update-component"
+TEAM_ID = 8558
+SEASONS = ["2013/2014", "2014/2015", "2015/2016"]
+
+
+def callback_payload(outputs, inputs, state=()):
+    """Body of a Dash callback request; ``outputs``/``inputs``/``state`` are ``(id, property[, value])``."""
+    outputs = [{"id": component, "property": prop} for component, prop in outputs]
+    if len(outputs) == 1:
+        output, outputs = f"{outputs[0]['id']}.{outputs[0]['property']}", outputs[0]
+    else:
+        output = "...".join(f"{o['id']}.{o['property']}" for o in outputs)
+        output = f"..{output}.."
+    return {
+        "output": output,
+        "outputs": outputs,
+        "inputs": [{"id": component, "property": prop, "value": value} for component, prop, value in inputs],
+        "changedPropIds": [f"{component}.{prop}" for component, prop, _ in inputs[:1]],
+        "state": [{"id": component, "property": prop, "value": value} for component, prop, value in state],
+    }
+
+
+def render(tab):
+    return callback_payload([("tabs-content", "children")], [("tabs", "value", tab)])
+
+
+def tab_requests(team_id=TEAM_ID):
+    """Callback bodies per tab, one list entry per request a tab view sends."""
+    seasons = [[]] + [[season] for season in SEASONS]
+    return {
+        "tab-1": [render("tab-1")] + [
+            callback_payload(
+                [("promising-scatter", "figure"), ("brush-summary", "children"), ("promising-exports", "children")],
+                [("promising-brush", "data", brush)],
+            )
+            for brush in (None, [[17, 70], [17, 95], [21, 95], [21, 70]])
+        ],
+        "tab-2": [render("tab-2")] + [
+            callback_payload(
+                [("heatmap-bk", "figure"), ("heatmap-mf", "figure"), ("heatmap-fw", "figure"),
+                 ("heatmap-page-label", "children"), ("heatmap-exports", "children")],
+                [("heatmap-top-n", "value", top_n), ("heatmap-min-ratio", "value", 100),
+                 ("heatmap-attributes", "value", []), ("heatmap-page", "value", page),
+                 ("player-search", "value", None), ("promising-brush", "data", None)],
+            )
+            for top_n, page in [(25, 1), (25, 2), (10, 1), (50, 1)]
+        ],
+        "tab-3": [render("tab-3")] + [
+            payload
+            for value in seasons
+            for payload in (
+                callback_payload(
+                    [("team-bar", "figure"), ("team-violin", "figure"), ("team-exports", "children")],
+                    [("team-select", "value", team_id), ("team-seasons", "value", value)],
+                ),
+                callback_payload(
+                    [("team-possession", "figure")],
+                    [("team-select", "value", team_id), ("team-seasons", "value", value)],
+                ),
+            )
+        ],
+        "tab-4": [render("tab-4")] + [
+            callback_payload(
+                [("shot-map", "figure"), ("shot-exports", "children")],
+                [("shot-team", "value", team_id), ("shot-seasons", "value", value), ("shot-kind", "value", kind),
+                 ("shot-per-match", "value", [])],
+            )
+            for value in seasons for kind in ("shots", "goals")
+        ],
+        "tab-5": [render("tab-5")] + [
+            callback_payload(
+                [("ratings-history", "figure"), ("ratings-standings", "figure")],
+                [("ratings-teams", "value", [team_id]), ("ratings-date", "date", date)],
+            )
+            for date in ("2016-05-31", "2015-05-31", "2014-05-31")
+        ],
+    }
+
+
+def post(url, body, timeout=60):
+    request = urllib.request.Request(
+        url, data=body, headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, len(response.read())
+
+
+def run_tab(url, payloads, concurrency, duration):
+    """Hammer ``url`` with ``payloads`` round-robin; requests/s, latency percentiles and errors."""
+    bodies = itertools.cycle([json.dumps(payload).encode() for payload in payloads])
+    lock = threading.Lock()
+    latencies, errors, sent = [], [], [0]
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with lock:
+                body = next(bodies)
+            start = time.perf_counter()
+            try:
+                status, size = post(url, body)
+                ok = status == 200
+            except (urllib.error.URLError, OSError) as e:
+                ok, status, size = False, getattr(e, "code", repr(e)), 0
+            elapsed = time.perf_counter() - start
+            with lock:
+                sent[0] += size
+                (latencies if ok else errors).append(elapsed if ok else status)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_second": round(len(latencies) / wall, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1) if len(ms) else None,
+        "p95_ms": round(float(np.percentile(ms, 95)), 1) if len(ms) else None,
+        "max_ms": round(float(ms.max()), 1) if len(ms) else None,
+        "kb_per_request": round(sent[0] / 1024 / max(len(latencies), 1), 1),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8050")
+    parser.add_argument("--concurrency", type=int, default=8, help="simultaneous clients")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per tab")
+    parser.add_argument("--tabs", nargs="*", help="tabs to test, e.g. tab-2 tab-4 (default all)")
+    parser.add_argument("--team", type=int, default=TEAM_ID, help="team_api_id for the team tabs")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/") + CALLBACK_PATH
+    requests = tab_requests(args.team)
+    results = {}
+    print(f"{'tab':<8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'KB/req':>8}{'errors':>8}")
+    for tab in args.tabs or list(requests):
+        result = results[tab] = run_tab(url, requests[tab], args.concurrency, args.duration)
+        print(f"{tab:<8}{result['requests_per_second']:>8}{result['p50_ms'] or '-':>9}{result['p95_ms'] or '-':>9}"
+              f"{result['max_ms'] or '-':>9}{result['kb_per_request']:>8}{result['errors']:>8}")
+        if result["first_error"] is not None:
+            print(f"  first error: {result['first_error']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"url": args.url, "concurrency": args.concurrency, "duration": args.duration,
+                       "tabs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Incremental build of the derived data and figures.
+
+Each stage runs one of the figure scripts and declares the files it reads
+and writes. A stage is re-run only when the content hash of one of its
+inputs differs from the last successful run, or an output is missing.
+Stages whose inputs are ready run in parallel, each in its own process.
+
+    python pipeline.py                # rebuild whatever is out of date
+    python pipeline.py --dry-run      # list the stages that would run
+    python pipeline.py team_analysis --force
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+STATE_DIR = ".pipeline"
+STATE_FILE = os.path.join(STATE_DIR, "state.json")
+LOG_DIR = os.path.join(STATE_DIR, "logs")
+
+SHARED_CODE = ["data_store.py", "instrumentation.py", "figure_store.py"]
+
+
+class Stage:
+    def __init__(self, name, script, inputs, outputs):
+        self.name = name
+        self.script = script
+        self.inputs = [script] + SHARED_CODE + list(inputs)
+        self.outputs = list(outputs)
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+STAGES = [
+    Stage(
+        "player_analysis",
+        "scatterplot.py",
+        inputs=["snapshots.py", "data/Player.csv", "data/Player_Attributes.csv"],
+        outputs=["data/promising_names.txt", "data/promising_ids.txt", "figures/fig_promising.json.gz"],
+    ),
+    Stage(
+        "position_groups",
+        "heatmap.py",
+        inputs=[
+            "lineups.py",
+            "player_index.py",
+            "snapshots.py",
+            "data/Player.csv",
+            "data/Player_Attributes.csv",
+            "data/Match.csv",
+            "data/PositionReference.csv",
+            "data/promising_ids.txt",
+        ],
+        outputs=[
+            "grouped_players/bk_players.csv",
+            "grouped_players/mf_players.csv",
+            "grouped_players/fw_players.csv",
+        ],
+    ),
+    Stage(
+        "team_analysis",
+        "bar_and_violin_interactive.py",
+        inputs=[
+            "team_report.py",
+            "results.py",
+            "swarm.py",
+            "events.py",
+            "team_cube.py",
+            "data/Match.csv",
+            "data/Match_Possesion.csv",
+            "data/Match_Shots_On.csv",
+            "data/Match_Shots_Off.csv",
+            "data/Match_Corner.csv",
+            "data/Match_Cards.csv",
+            "data/Match_Goals.csv",
+            "data/Team.csv",
+            "data/Team_Attributes.csv",
+        ],
+        outputs=["figures/fig_bar.json.gz", "figures/fig_violin.json.gz"],
+    ),
+]
+
+
+def dependencies(stages):
+    """Map each stage name to the names of the stages producing its inputs."""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    deps = {
+        stage.name: {producers[path] for path in stage.inputs if path in producers}
+        for stage in stages
+    }
+
+    # Reject cycles up front so the scheduler can't stall
+    visiting, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle through stage {name!r}")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in deps:
+        visit(name)
+    return deps
+
+
+class FileHasher:
+    """sha256 of files, reusing the previous hash while mtime and size are unchanged."""
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+
+    def __call__(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self.known.get(path)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.known[path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest.hexdigest(),
+        }
+        return digest.hexdigest()
+
+
+def load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}, "stages": {}}
+
+
+def save_state(state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = f"{STATE_FILE}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, STATE_FILE)
+
+
+def input_hashes(stage, hasher):
+    return {path: hasher(path) for path in stage.inputs}
+
+
+def is_stale(stage, state, hasher):
+    previous = state["stages"].get(stage.name)
+    if previous is None:
+        return True
+    if any(not os.path.exists(path) for path in stage.outputs):
+        return True
+    return previous["inputs"] != input_hashes(stage, hasher)
+
+
+def run_stage(stage):
+    """Run a stage's script in a fresh interpreter, logging its output."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    env = dict(os.environ, PLOTLY_RENDERER="json", MPLBACKEND="Agg")
+    start = time.perf_counter()
+    with open(os.path.join(LOG_DIR, f"{stage.name}.log"), "w") as log:
+        result = subprocess.run(
+            [sys.executable, stage.script], stdout=log, stderr=subprocess.STDOUT, env=env
+        )
+    return result.returncode, time.perf_counter() - start
+
+
+def run(targets=None, force=False, dry_run=False, jobs=None, stages=STAGES):
+    """Bring ``targets`` (default: every stage) and their dependencies up to date.
+
+    Returns ``{stage name: status}`` with status "ran", "skipped", "failed",
+    "blocked" (an upstream stage failed) or "stale" for a dry run.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    deps = dependencies(stages)
+
+    wanted = set()
+    pending_names = list(targets or by_name)
+    while pending_names:
+        name = pending_names.pop()
+        if name not in by_name:
+            raise ValueError(f"Unknown stage {name!r}")
+        if name not in wanted:
+            wanted.add(name)
+            pending_names.extend(deps[name])
+
+    state = load_state()
+    hasher = FileHasher(state["files"])
+    status = {}
+
+    if dry_run:
+        for stage in stages:
+            if stage.name in wanted:
+                stale = force or is_stale(stage, state, hasher)
+                upstream = any(status.get(dep) == "stale" for dep in deps[stage.name])
+                status[stage.name] = "stale" if stale or upstream else "skipped"
+        return status
+
+    pending = {name for name in wanted}
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or len(stages)) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                if any(status.get(dep) in ("failed", "blocked") for dep in deps[name]):
+                    status[name] = "blocked"
+                    pending.discard(name)
+                elif all(dep in status for dep in deps[name]):
+                    stage = by_name[name]
+                    pending.discard(name)
+                    if not force and not is_stale(stage, state, hasher):
+                        status[name] = "skipped"
+                        continue
+                    # Hash inputs before the run so edits made during it trigger a rebuild
+                    running[pool.submit(run_stage, stage)] = (stage, input_hashes(stage, hasher))
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, hashes = running.pop(future)
+                returncode, elapsed = future.result()
+                if returncode == 0:
+                    status[stage.name] = "ran"
+                    state["stages"][stage.name] = {
+                        "inputs": hashes,
+                        "outputs": {path: hasher(path) for path in stage.outputs},
+                        "seconds": round(elapsed, 3),
+                    }
+                else:
+                    status[stage.name] = "failed"
+                print(f"{stage.name}: {status[stage.name]} in {elapsed:.1f}s")
+
+    state["files"] = hasher.known
+    save_state(state)
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("stages", nargs="*", help="stages to build (default: all)")
+    parser.add_argument("--force", action="store_true", help="re-run even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    parser.add_argument("-j", "--jobs", type=int, help="maximum stages run in parallel")
+    args = parser.parse_args()
+
+    result = run(args.stages or None, force=args.force, dry_run=args.dry_run, jobs=args.jobs)
+    for name, outcome in result.items():
+        print(f"{name}: {outcome}")
+    sys.exit(1 if any(outcome in ("failed", "blocked") for outcome in result.values()) else 0)
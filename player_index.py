@@ -0,0 +1,124 @@
+"""Player lookup by ``player_api_id``, name prefix and pitch role.
+
+``PlayerIndex`` keeps every player in id order plus a sorted array of
+normalised name tokens (the full name and each word of it), so a prefix
+search is two binary searches instead of a scan over the names. Names are
+only labels: players sharing a name stay distinct by id.
+"""
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR, load_derived, load_table
+
+ROLES_TABLE = "Player_Roles"
+
+
+def normalize(text):
+    """Lower-case ``text`` without accents, so 'Ozil' finds 'Özil'."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def player_roles(data_dir=DATA_DIR):
+    """Modal position and role per player (``lineups.player_role_index``), cached."""
+    def build():
+        from lineups import build_lineups, lineup_columns, player_role_index
+
+        id_cols, y_cols = lineup_columns()
+        matches = load_table("Match", columns=["id", "date"] + id_cols + y_cols, data_dir=data_dir)
+        positions = load_table("PositionReference", data_dir=data_dir)
+        return player_role_index(build_lineups(matches), positions).reset_index()
+
+    return load_derived(ROLES_TABLE, ["Match", "PositionReference"], build, data_dir=data_dir).set_index("player_api_id")
+
+
+class PlayerIndex:
+    """Players keyed by ``player_api_id`` with prefix search over their names."""
+
+    def __init__(self, players, roles=None):
+        players = players.drop_duplicates("player_api_id").sort_values("player_api_id")
+        if roles is not None:
+            players = players.join(roles[["position", "role"]], on="player_api_id")
+        self.players = players.set_index("player_api_id")
+        self._ids = self.players.index.to_numpy()
+
+        names = self.players["player_name"].fillna("").map(normalize)
+        _, name_rank = np.unique(names.to_numpy(dtype=str), return_inverse=True)
+        tokens, token_ids, token_full, token_rank = [], [], [], []
+        for player_id, name, rank in zip(self._ids, names, name_rank):
+            words = name.split()
+            for i, token in enumerate(dict.fromkeys([name] + words[1:])):
+                tokens.append(token)
+                token_ids.append(player_id)
+                token_full.append(i == 0)
+                token_rank.append(rank)
+        order = np.argsort(tokens, kind="stable")
+        self._tokens = np.array(tokens, dtype=str)[order]
+        self._token_ids = np.array(token_ids)[order]
+        # Sort key of each token's player in search results: full-name matches, then by name
+        self._token_key = np.where(np.array(token_full), 0, len(names) + 1)[order] + np.array(token_rank)[order]
+
+        # Display labels; players sharing a name get their birth year, role and id
+        labels = self.players["player_name"].fillna("").astype(str)
+        shared = labels.duplicated(keep=False).to_numpy()
+        details = pd.Series("", index=self.players.index)
+        if "birthday" in self.players:
+            details += self.players["birthday"].astype(str).str[:4].where(self.players["birthday"].notna(), "") + ", "
+        if "role" in self.players:
+            details += self.players["role"].fillna("").astype(str) + ", "
+        details = (details + "#" + self.players.index.astype(str)).str.replace(r"^(, )+|(?<=, ), ", "", regex=True)
+        labels[shared] = labels[shared] + " (" + details[shared] + ")"
+        self._labels = labels.to_numpy(dtype=object)
+
+    @classmethod
+    def load(cls, data_dir=DATA_DIR):
+        """Index over Player.csv, with roles when the match data is available."""
+        players = load_table("Player", columns=["player_api_id", "player_name", "birthday"], data_dir=data_dir)
+        try:
+            roles = player_roles(data_dir)
+        except FileNotFoundError:
+            roles = None
+        return cls(players, roles)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, player_id):
+        return player_id in self.players.index
+
+    def get(self, player_id):
+        """Row of one player as a dict, or None."""
+        if player_id not in self.players.index:
+            return None
+        return dict(self.players.loc[player_id], player_api_id=player_id)
+
+    def ids_for_name(self, name):
+        """Every player id with exactly this name (duplicates included)."""
+        return self.players.index[self.players["player_name"] == name].tolist()
+
+    def search(self, query, limit=10):
+        """Ids of players whose name, or a word of it, starts with ``query``.
+
+        Full-name matches come first, then alphabetical by name.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        lo = np.searchsorted(self._tokens, prefix, side="left")
+        hi = np.searchsorted(self._tokens, prefix + "\U0010ffff", side="left")
+        order = np.argsort(self._token_key[lo:hi], kind="stable")
+        ids = self._token_ids[lo:hi][order]
+        _, first = np.unique(ids, return_index=True)  # best-ranked token per player
+        return ids[np.sort(first)[:limit]].tolist()
+
+    def label(self, player_id):
+        """Display name; players sharing a name get their birth year, role and id."""
+        return self._labels[np.searchsorted(self._ids, player_id)]
+
+    def role_ids(self, role):
+        """Ids of the players whose modal role is ``role`` (e.g. 'BK')."""
+        if "role" not in self.players:
+            return []
+        return self.players.index[self.players["role"] == role].tolist()
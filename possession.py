@@ -0,0 +1,184 @@
+"""Possession-vs-minute curves per team and season.
+
+Match_Possesion holds a few running possession readings per match (minute
+``elapsed`` plus ``elapsed_plus`` stoppage time). Every match is resampled
+onto a fixed minute grid in one pass: a single sort of all readings and one
+binary search for every (match, minute) pair, taking the latest reading at
+or before that minute. The per-team mean curves are stored as a float32
+``team x season x minute`` array with the match count behind every value,
+saved as .npy files and memory-mapped on load.
+"""
+import json
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+from data_store import CACHE_DIRNAME, DATA_DIR, load_table, source_hashes
+from results import team_matches
+
+CURVES_DIRNAME = "possession"
+SOURCES = ["Match", "Match_Possesion"]
+MINUTES = np.arange(1, 91)
+
+
+def resample_matches(samples, minutes=MINUTES):
+    """``(match_ids, home, away)``: possession of each match as of every minute in ``minutes``.
+
+    ``home``/``away`` are ``(n_matches, n_minutes)`` arrays, NaN before a
+    match's first reading. Stoppage-time readings count at the minute they
+    extend (45 or 90), after the regular reading of that minute.
+    """
+    samples = samples.dropna(subset=["match_id", "elapsed", "homepos", "awaypos"])
+    match_ids, match = np.unique(samples["match_id"].to_numpy(dtype="int64"), return_inverse=True)
+    elapsed = np.clip(samples["elapsed"].to_numpy(dtype="int64"), 0, minutes[-1])
+    plus = samples["elapsed_plus"].fillna(0).to_numpy(dtype="int64") if "elapsed_plus" in samples else 0
+
+    # Key readings by (match, minute); stoppage time orders readings within a minute
+    stride = minutes[-1] + 1
+    order = np.lexsort((plus, elapsed, match))
+    keys = (match * stride + elapsed)[order]
+    home = samples["homepos"].to_numpy(dtype="float32")[order]
+    away = samples["awaypos"].to_numpy(dtype="float32")[order]
+
+    grid_keys = np.arange(len(match_ids))[:, None] * stride + minutes[None, :]
+    latest = np.searchsorted(keys, grid_keys, side="right") - 1
+    # A reading only counts for its own match
+    valid = (latest >= 0) & (keys[latest.clip(0)] // stride == grid_keys // stride)
+    latest = latest.clip(0)
+    return match_ids, np.where(valid, home[latest], np.nan), np.where(valid, away[latest], np.nan)
+
+
+class PossessionCurves:
+    """``means[team, season, minute]`` possession and the ``counts`` of matches behind each value."""
+
+    def __init__(self, means, counts, team_ids, seasons, minutes=MINUTES):
+        self.means = means
+        self.counts = counts
+        self.team_ids = np.asarray(team_ids, dtype="int64")
+        self.seasons = list(seasons)
+        self.minutes = np.asarray(minutes)
+        self.sources = {}
+
+    def curve(self, team_id, seasons=None):
+        """``(mean, matches)`` per minute for one team over ``seasons`` (all when empty)."""
+        t = np.searchsorted(self.team_ids, team_id) if team_id is not None else len(self.team_ids)
+        if t >= len(self.team_ids) or self.team_ids[t] != team_id:
+            raise ValueError(f"No possession data for team {team_id}")
+        s = [self.seasons.index(season) for season in seasons if season in self.seasons] if seasons else slice(None)
+        means = np.asarray(self.means[t, s], dtype="float64")
+        counts = np.asarray(self.counts[t, s], dtype="float64")
+        matches = counts.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(matches > 0, np.nansum(means * counts, axis=0) / matches, np.nan)
+        return mean, matches.astype("int64")
+
+    def save(self, path, sources=None):
+        # Replace files rather than overwrite them, so live memory maps stay valid
+        os.makedirs(path, exist_ok=True)
+        arrays = {"means": self.means, "counts": self.counts, "team_ids": self.team_ids, "minutes": self.minutes}
+        for name, array in arrays.items():
+            tmp = os.path.join(path, f"{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+        meta = {"seasons": self.seasons, "sources": sources or {}}
+        tmp = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        curves = cls(
+            np.load(os.path.join(path, "means.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "counts.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "team_ids.npy")),
+            meta["seasons"],
+            np.load(os.path.join(path, "minutes.npy")),
+        )
+        curves.sources = meta["sources"]
+        return curves
+
+
+def build_possession_curves(matches, samples, minutes=MINUTES):
+    """Average each team's resampled possession per season into PossessionCurves."""
+    match_ids, home, away = resample_matches(samples, minutes)
+    long = team_matches(matches).dropna(subset=["team_api_id"])
+    rows = np.searchsorted(match_ids, long["match_id"].to_numpy()).clip(max=max(len(match_ids) - 1, 0))
+    covered = match_ids[rows] == long["match_id"].to_numpy() if len(match_ids) else np.zeros(len(long), dtype=bool)
+    long, rows = long[covered], rows[covered]
+
+    # The team's own side of each covered match
+    values = np.where((long["side"].to_numpy() == "home")[:, None], home[rows], away[rows])
+    seasons = sorted(long["season"].astype(str).unique())
+    team_ids = np.unique(long["team_api_id"].to_numpy(dtype="int64"))
+    t = np.searchsorted(team_ids, long["team_api_id"].to_numpy(dtype="int64"))
+    s = np.searchsorted(np.array(seasons), long["season"].astype(str).to_numpy())
+    shape = (len(team_ids), len(seasons), len(minutes))
+
+    # One weighted bincount over (team, season, minute) cells for sums and counts
+    flat = ((t * len(seasons) + s)[:, None] * len(minutes) + np.arange(len(minutes))[None, :]).ravel()
+    present = ~np.isnan(values.ravel())
+    size = int(np.prod(shape))
+    totals = np.bincount(flat[present], weights=values.ravel()[present], minlength=size)
+    counts = np.bincount(flat[present], minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, totals / counts, np.nan).astype("float32")
+    counts = counts.astype("uint16" if counts.max(initial=0) <= np.iinfo("uint16").max else "uint32")
+    return PossessionCurves(means.reshape(shape), counts.reshape(shape), team_ids, seasons, minutes)
+
+
+def curves_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, CACHE_DIRNAME, CURVES_DIRNAME)
+
+
+def load_possession_curves(data_dir=DATA_DIR):
+    """Memory-mapped PossessionCurves, rebuilt when Match or Match_Possesion changed."""
+    path = curves_path(data_dir)
+    hashes = source_hashes(SOURCES, data_dir)
+    try:
+        curves = PossessionCurves.load(path)
+        if curves.sources == hashes:
+            return curves
+    except (OSError, ValueError, KeyError):
+        pass
+
+    matches = load_table(
+        "Match",
+        columns=["id", "season", "home_team_api_id", "away_team_api_id", "home_team_goal", "away_team_goal"],
+        data_dir=data_dir,
+    )
+    samples = load_table("Match_Possesion", columns=["match_id", "homepos", "awaypos", "elapsed", "elapsed_plus"],
+                         data_dir=data_dir)
+    build_possession_curves(matches, samples).save(path, hashes)
+    return PossessionCurves.load(path)
+
+
+def possession_figure(minutes, mean, matches, title=""):
+    """Possession-vs-minute line with the 50% mark."""
+    fig = go.Figure(go.Scatter(
+        x=minutes,
+        y=np.round(mean, 2),
+        customdata=matches,
+        mode="lines",
+        line=dict(color="#1f77b4", width=3),
+        hovertemplate="Minute %{x}<br>Possession: %{y:.1f}%<br>Matches: %{customdata}<extra></extra>",
+    ))
+    fig.add_hline(y=50, line=dict(color="grey", dash="dot"))
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title="Minute", range=[minutes[0], minutes[-1]], dtick=15),
+        yaxis=dict(title="Average possession (%)"),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        height=400,
+    )
+    return fig
+
+
+if __name__ == "__main__":
+    curves = load_possession_curves()
+    print(f"{curves.means.shape} possession curves at {curves_path()}")
@@ -0,0 +1,283 @@
+"""Elo ratings and rolling form per team, updated incrementally match by match.
+
+Matches are processed in date order with the per-team state (rating, last
+``FORM_MATCHES`` points) held in NumPy arrays. Elo is sequential, but a
+team's rating only depends on its own earlier matches, so each batch is
+split into rounds in which no team plays twice (round = one more than the
+latest round of either team) and every round is one vectorised update.
+After every match both teams' new rating and form are appended to a dated
+history, which answers "as of" queries with a binary search.
+
+The state is saved under ``data/.cache/ratings``; when Match.csv gains
+matches only the new ones are processed (``python ratings.py --rebuild``
+after editing past matches).
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from data_store import CACHE_DIRNAME, DATA_DIR, load_table, source_hashes
+from results import RESULT_POINTS
+
+RATINGS_DIRNAME = "ratings"
+SOURCES = ["Match"]
+INITIAL_RATING = 1500.0
+K_FACTOR = 20.0
+HOME_ADVANTAGE = 60.0
+FORM_MATCHES = 5
+MATCH_COLUMNS = ["id", "date", "home_team_api_id", "away_team_api_id", "home_team_goal", "away_team_goal"]
+HISTORY_COLUMNS = ["team", "match", "date", "rating", "form"]
+
+
+def match_rounds(home, away):
+    """Round of each match (in the given order) such that no team plays twice in a round
+    and every team's matches fall in increasing rounds."""
+    last = {}
+    rounds = np.empty(len(home), dtype="int64")
+    for i, (h, a) in enumerate(zip(home.tolist(), away.tolist())):
+        r = max(last.get(h, -1), last.get(a, -1)) + 1
+        rounds[i] = last[h] = last[a] = r
+    return rounds
+
+
+class TeamRatings:
+    """Current Elo rating and recent points of every team seen, plus the rating history."""
+
+    def __init__(self):
+        self.team_ids = np.empty(0, dtype="int64")
+        self.ratings = np.empty(0, dtype="float64")
+        self.recent = np.empty((0, FORM_MATCHES), dtype="float32")  # ring buffer of points, NaN when unplayed
+        self.played = np.empty(0, dtype="int64")
+        self.history = {
+            "team": np.empty(0, dtype="int64"),
+            "match": np.empty(0, dtype="int64"),
+            "date": np.empty(0, dtype="datetime64[s]"),
+            "rating": np.empty(0, dtype="float32"),
+            "form": np.empty(0, dtype="float32"),
+        }
+        self.sources = {}
+        self._order = None
+
+    @property
+    def last_date(self):
+        return self.history["date"].max() if len(self.history["date"]) else None
+
+    def _add_teams(self, team_ids):
+        new = np.setdiff1d(team_ids, self.team_ids)
+        if not len(new):
+            return
+        team_ids = np.union1d(self.team_ids, new)
+        old = np.searchsorted(team_ids, self.team_ids)
+        ratings = np.full(len(team_ids), INITIAL_RATING)
+        recent = np.full((len(team_ids), FORM_MATCHES), np.nan, dtype="float32")
+        played = np.zeros(len(team_ids), dtype="int64")
+        ratings[old], recent[old], played[old] = self.ratings, self.recent, self.played
+        self.team_ids, self.ratings, self.recent, self.played = team_ids, ratings, recent, played
+
+    def form(self, positions):
+        """Points per match over each team's last ``FORM_MATCHES`` matches."""
+        recent = self.recent[positions]
+        with np.errstate(invalid="ignore"):
+            return np.nansum(recent, axis=1) / np.maximum((~np.isnan(recent)).sum(axis=1), 1)
+
+    def update(self, matches):
+        """Fold the matches not processed yet into the ratings; returns how many were processed.
+
+        Raises ValueError for a new match dated before the last processed one,
+        which needs a rebuild rather than an update.
+        """
+        matches = matches.dropna(subset=MATCH_COLUMNS)
+        matches = matches[(matches["home_team_api_id"] != matches["away_team_api_id"]).to_numpy()]
+        matches = matches[~np.isin(matches["id"].to_numpy(dtype="int64"), self.history["match"])]
+        if not len(matches):
+            return 0
+        dates = pd.to_datetime(matches["date"]).to_numpy().astype("datetime64[s]")
+        if self.last_date is not None and dates.min() < self.last_date:
+            raise ValueError("New matches predate the processed ones; rebuild the ratings")
+
+        order = np.lexsort((matches["id"].to_numpy(), dates))
+        match_ids = matches["id"].to_numpy(dtype="int64")[order]
+        dates = dates[order]
+        home_ids = matches["home_team_api_id"].to_numpy(dtype="int64")[order]
+        away_ids = matches["away_team_api_id"].to_numpy(dtype="int64")[order]
+        diff = (matches["home_team_goal"].to_numpy(dtype="int64") - matches["away_team_goal"].to_numpy(dtype="int64"))[order]
+        outcome = np.sign(diff) + 1  # 0 away win, 1 draw, 2 home win
+
+        self._add_teams(np.union1d(home_ids, away_ids))
+        home = np.searchsorted(self.team_ids, home_ids)
+        away = np.searchsorted(self.team_ids, away_ids)
+        rounds = match_rounds(home, away)
+        by_round = np.argsort(rounds, kind="stable")
+        bounds = np.flatnonzero(np.diff(rounds[by_round])) + 1
+
+        rating_after = np.empty((len(match_ids), 2), dtype="float32")
+        form_after = np.empty((len(match_ids), 2), dtype="float32")
+        for rows in np.split(by_round, bounds):
+            h, a = home[rows], away[rows]
+            expected = 1 / (1 + 10 ** ((self.ratings[a] - self.ratings[h] - HOME_ADVANTAGE) / 400))
+            delta = K_FACTOR * (outcome[rows] / 2 - expected)
+            self.ratings[h] += delta
+            self.ratings[a] -= delta
+
+            self.recent[h, self.played[h] % FORM_MATCHES] = RESULT_POINTS[outcome[rows]]
+            self.recent[a, self.played[a] % FORM_MATCHES] = RESULT_POINTS[2 - outcome[rows]]
+            self.played[h] += 1
+            self.played[a] += 1
+
+            rating_after[rows, 0], rating_after[rows, 1] = self.ratings[h], self.ratings[a]
+            form_after[rows, 0], form_after[rows, 1] = self.form(h), self.form(a)
+
+        appended = {
+            "team": np.column_stack([home_ids, away_ids]).ravel(),
+            "match": np.repeat(match_ids, 2),
+            "date": np.repeat(dates, 2),
+            "rating": rating_after.ravel(),
+            "form": form_after.ravel(),
+        }
+        self.history = {key: np.concatenate([self.history[key], appended[key]]) for key in HISTORY_COLUMNS}
+        self._order = None
+        return len(match_ids)
+
+    def _sorted_history(self):
+        # History rows by (team, date), processing order breaking ties
+        if self._order is None:
+            self._order = np.lexsort((np.arange(len(self.history["team"])), self.history["date"], self.history["team"]))
+        return self._order
+
+    def as_of(self, date, team_ids=None):
+        """Rating, form and matches played of each team after its last match on or before ``date``."""
+        team_ids = self.team_ids if team_ids is None else np.asarray(team_ids, dtype="int64")
+        table = pd.DataFrame({"rating": INITIAL_RATING, "form": np.nan, "matches": 0},
+                             index=pd.Index(team_ids, name="team_api_id"))
+        if not len(self.history["team"]):
+            return table
+
+        # One search over (team, date) keys for the last row of each team dated <= date
+        order = self._sorted_history()
+        teams = self.history["team"][order]
+        seconds = self.history["date"][order].astype("int64")
+        start, span = seconds.min(), seconds.max() - seconds.min() + 2
+        keys = np.searchsorted(self.team_ids, teams) * span + (seconds - start)
+        at = np.clip(np.datetime64(pd.Timestamp(date), "s").astype("int64") - start, -1, span - 2)
+        last = np.searchsorted(keys, np.searchsorted(self.team_ids, team_ids) * span + at, side="right") - 1
+        found = (last >= 0) & (teams[last.clip(0)] == team_ids)
+        rows = order[last[found]]
+        first = np.searchsorted(teams, team_ids[found], side="left")
+        table.loc[found, "rating"] = self.history["rating"][rows]
+        table.loc[found, "form"] = self.history["form"][rows]
+        table.loc[found, "matches"] = last[found] - first + 1
+        return table
+
+    def team_history(self, team_id):
+        """Dated rating and form of one team after each of its matches."""
+        rows = self._sorted_history()
+        rows = rows[self.history["team"][rows] == team_id]
+        return pd.DataFrame({key: self.history[key][rows] for key in ("match", "date", "rating", "form")})
+
+    def save(self, path, sources=None):
+        # Replace files rather than overwrite them, so readers never see a half-written state
+        os.makedirs(path, exist_ok=True)
+        arrays = {"team_ids": self.team_ids, "ratings": self.ratings, "recent": self.recent, "played": self.played}
+        arrays.update({f"history_{key}": value for key, value in self.history.items()})
+        for name, array in arrays.items():
+            tmp = os.path.join(path, f"{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+        meta = {"sources": sources or {}}
+        tmp = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        ratings = cls()
+        for name in ("team_ids", "ratings", "recent", "played"):
+            setattr(ratings, name, np.load(os.path.join(path, f"{name}.npy")))
+        ratings.history = {key: np.load(os.path.join(path, f"history_{key}.npy")) for key in HISTORY_COLUMNS}
+        ratings.sources = meta["sources"]
+        return ratings
+
+
+def ratings_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, CACHE_DIRNAME, RATINGS_DIRNAME)
+
+
+def load_ratings(data_dir=DATA_DIR):
+    """TeamRatings over Match.csv, processing only matches added since the last run."""
+    path = ratings_path(data_dir)
+    hashes = source_hashes(SOURCES, data_dir)
+    try:
+        ratings = TeamRatings.load(path)
+        if ratings.sources == hashes:
+            return ratings
+    except (OSError, ValueError, KeyError):
+        ratings = TeamRatings()
+
+    matches = load_table("Match", columns=MATCH_COLUMNS, data_dir=data_dir)
+    # Matches removed from the table, or added before the last processed date, need a full rebuild
+    if not np.isin(ratings.history["match"], matches["id"].to_numpy(dtype="int64")).all():
+        ratings = TeamRatings()
+    try:
+        ratings.update(matches)
+    except ValueError:
+        ratings = TeamRatings()
+        ratings.update(matches)
+    ratings.sources = hashes
+    ratings.save(path, hashes)
+    return ratings
+
+
+def ratings_figure(histories, date=None, title="Elo rating"):
+    """Rating-over-time line per team (``histories``: name -> ``team_history`` frame)."""
+    fig = go.Figure([
+        go.Scatter(
+            x=history["date"],
+            y=np.round(history["rating"], 1),
+            customdata=np.round(history["form"], 2),
+            mode="lines",
+            name=name,
+            hovertemplate="%{x|%Y-%m-%d}<br>Elo: %{y}<br>Form: %{customdata} pts/match<extra>" + name + "</extra>",
+        )
+        for name, history in histories.items()
+    ])
+    if date is not None:
+        fig.add_vline(x=pd.Timestamp(date).timestamp() * 1000, line=dict(color="grey", dash="dot"))
+    fig.update_layout(title=title, yaxis_title="Elo rating", plot_bgcolor="white", paper_bgcolor="white",
+                      height=450, legend=dict(orientation="h"))
+    return fig
+
+
+def standings_figure(table, names, title=""):
+    """Horizontal bars of the ``as_of`` ratings, coloured by form."""
+    table = table.sort_values("rating")
+    fig = go.Figure(go.Bar(
+        x=table["rating"].round(1),
+        y=[names.get(team_id, str(team_id)) for team_id in table.index],
+        orientation="h",
+        marker=dict(color=table["form"], colorscale="RdYlGn", cmin=0, cmax=3,
+                    colorbar=dict(title=f"Form (last {FORM_MATCHES})")),
+        customdata=np.column_stack([table["form"].round(2), table["matches"]]),
+        hovertemplate="%{y}<br>Elo: %{x}<br>Form: %{customdata[0]} pts/match<br>Matches: %{customdata[1]}<extra></extra>",
+    ))
+    fig.update_layout(title=title, xaxis=dict(title="Elo rating", range=[table["rating"].min() - 20, table["rating"].max() + 20]),
+                      plot_bgcolor="white", paper_bgcolor="white", height=max(400, 22 * len(table)))
+    return fig
+
+
+if __name__ == "__main__":
+    import argparse
+    import shutil
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rebuild", action="store_true", help="recompute from scratch, e.g. after editing old matches")
+    if parser.parse_args().rebuild:
+        shutil.rmtree(ratings_path(), ignore_errors=True)
+    ratings = load_ratings()
+    print(f"{len(ratings.team_ids)} teams rated over {len(ratings.history['match']) // 2} matches, last {ratings.last_date}")
@@ -3,120 +3,208 @@ import numpy as np
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
 from sklearn.linear_model import LinearRegression
-import plotly.io as pio
+from figure_store import save_figure
+from data_store import load_table
+from snapshots import latest_attributes
+from instrumentation import configure_logging, stage
 
-# 1. Load player and attribute data
-player_attributes = pd.read_csv('data/Player_Attributes.csv')
-players = pd.read_csv('data/Player.csv')
-
-# 2. Convert dates and calculate float age as of 2017-01-01
-reference_date = pd.to_datetime('2017-01-01')
-players['birthday'] = pd.to_datetime(players['birthday'])
-player_attributes['date'] = pd.to_datetime(player_attributes['date'])
-merged = pd.merge(player_attributes, players, on='player_api_id')
-merged['age'] = ((reference_date - merged['birthday']).dt.total_seconds() / (365.25 * 24 * 60 * 60)).round(2)
-
-# 3. Keep latest record per player and filter for age < 24
-latest = merged.sort_values('date').groupby('player_api_id').tail(1)
-young = latest[latest['age'] < 24].copy()
+REFERENCE_DATE = pd.to_datetime('2017-01-01')
+MAX_AGE = 24
+PROMISING_NAMES = 'data/promising_names.txt'
+PROMISING_IDS = 'data/promising_ids.txt'
+FIGURE_PATH = 'figures/fig_promising.json.gz'
 
 cmap = plt.colormaps.get_cmap('RdYlGn')
 
+
 def rgba_to_str(rgba):
     r, g, b, a = [int(255 * val) if i < 3 else val for i, val in enumerate(rgba)]
     return f'rgba({r},{g},{b},{a:.2f})'
 
-# 4. Normalize potential and color map
-min_pot = young['potential'].min()
-max_pot = young['potential'].max()
-young['pot_norm'] = (young['potential'] - min_pot) / (max_pot - min_pot)
-colormap = plt.colormaps.get_cmap('RdYlGn')
-young['color'] = young['pot_norm'].apply(lambda x: rgba_to_str(cmap(x)))
-
-# 5. Regression line to derive opposing slope
-regression_data = young.dropna(subset=['age', 'potential'])
-X = regression_data['age'].values.reshape(-1, 1)
-y = regression_data['potential'].values
-reg = LinearRegression().fit(X, y)
-
-# Define dynamic polygon for brush
-start_x = 16.5
-start_y = 75
-end_x = 23.95
-opposite_slope = -3 * reg.coef_[0]  # adjustable multiplier
-end_y = start_y + opposite_slope * (end_x - start_x)
-triangle_path = f'M {start_x},{start_y} L {start_x},95 L {end_x},95 L {end_x},{end_y} Z'
-
-# 6. Subset: players inside polygon brush (≤23.95, between boundaries)
-young['top_y'] = 95
-young['bottom_y'] = start_y + opposite_slope * (young['age'] - start_x)
-
-promising_players = young[
-    (young['age'] <= 23.95) &
-    (young['age'] >= start_x) &
-    (young['potential'] >= young['bottom_y']) &
-    (young['potential'] <= 95)
-].copy()
-
-promising_players['potential_age_ratio'] = promising_players['potential'] / promising_players['age']
-promising_sorted = promising_players.sort_values(by='potential_age_ratio', ascending=False)
-
-# 7. Fit regression line for plot
-x_range = np.linspace(young['age'].min(), young['age'].max(), 100)
-y_pred = reg.predict(x_range.reshape(-1, 1))
-
-
-# 8. Plot with Plotly
-fig = go.Figure()
-
-# All players
-fig.add_trace(go.Scatter(
-    x=young['age'],
-    y=young['potential'],
-    mode='markers',
-    marker=dict(color=young['color'], size=10, line=dict(color='black', width=1)),
-    text=young['player_name'],
-    hovertemplate='<b>%{text}</b><br>Age: %{x:.2f}<br>Potential: %{y}<extra></extra>'
-))
-
-# Regression trend line
-fig.add_trace(go.Scatter(
-    x=x_range,
-    y=y_pred,
-    mode='lines',
-    line=dict(color='black', dash='dot'),
-    name='Trend Line'
-))
-
-# Green polygon brush
-fig.add_shape(
-    type='path',
-    path=triangle_path,
-    fillcolor='rgba(0,128,0,0.1)',
-    line=dict(color='green'),
-    layer='below'
-)
-
-# Layout
-fig.update_layout(
-    title='Promising Players (Age as of Jan 1, 2017)',
-    xaxis_title='Age',
-    yaxis_title='Potential Rating',
-    plot_bgcolor='white',
-    paper_bgcolor='white',
-    xaxis=dict(showgrid=False),
-    yaxis=dict(showgrid=False),
-    showlegend=False
-)
-
-fig.show()
-
-promising_names = promising_sorted['player_name'].tolist()
-with open("data/promising_names.txt", "w") as f:
-    for name in promising_names:
-        f.write(name + "\n")
-
-pio.write_json(fig, "figures/fig_promising.json")
-# 9. Output subset
-print("Top Promising Players Inside Brush (Age as of Jan 1, 2017):")
-print(promising_sorted[['player_name', 'age', 'potential', 'potential_age_ratio']])
\ No newline at end of file
+
+def player_age(birthdays, reference_date=REFERENCE_DATE):
+    """Float age in years at ``reference_date``, to two decimals."""
+    birthdays = pd.to_datetime(birthdays)
+    return ((reference_date - birthdays).dt.total_seconds() / (365.25 * 24 * 60 * 60)).round(2)
+
+
+def load_young_players(columns=('player_api_id', 'date', 'potential'), reference_date=REFERENCE_DATE, max_age=MAX_AGE):
+    """Latest attribute record, name, age and colour of every player younger than ``max_age``.
+
+    ``columns`` are the Player_Attributes columns kept (None for all of them).
+    """
+    # 1. Load the latest attribute record per player and player data
+    with stage('scatterplot.load') as record:
+        player_attributes = latest_attributes(columns=list(columns) if columns else None)
+        players = load_table('Player', columns=['player_api_id', 'player_name', 'birthday'])
+        record.output(player_attributes, players)
+
+    # 2. Convert dates and calculate float age as of the reference date
+    with stage('scatterplot.merge_age') as record:
+        players['birthday'] = pd.to_datetime(players['birthday'])
+        player_attributes['date'] = pd.to_datetime(player_attributes['date'])
+        merged = pd.merge(player_attributes, players, on='player_api_id')
+        merged['age'] = player_age(merged['birthday'], reference_date)
+        record.output(merged)
+
+    # 3. Filter for age < max_age
+    young = merged[merged['age'] < max_age].copy()
+
+    # 4. Normalize potential and color map
+    min_pot = young['potential'].min()
+    max_pot = young['potential'].max()
+    young['pot_norm'] = (young['potential'] - min_pot) / (max_pot - min_pot)
+    young['color'] = young['pot_norm'].apply(lambda x: rgba_to_str(cmap(x)))
+    return young
+
+
+def fit_trend(young):
+    """Linear regression of potential on age."""
+    with stage('scatterplot.regression') as record:
+        record.input(young)
+        regression_data = young.dropna(subset=['age', 'potential'])
+        X = regression_data['age'].values.reshape(-1, 1)
+        y = regression_data['potential'].values
+        return LinearRegression().fit(X, y)
+
+
+def default_brush(reg, start_x=16.5, start_y=75, end_x=23.95, top_y=95, slope_factor=-3):
+    """Vertices of the default brush: ages ``start_x``..``end_x``, potential up to ``top_y``,
+    above a floor rising from ``start_y`` against the trend (``slope_factor`` times its slope)."""
+    opposite_slope = slope_factor * reg.coef_[0]
+    end_y = start_y + opposite_slope * (end_x - start_x)
+    return np.array([[start_x, start_y], [start_x, top_y], [end_x, top_y], [end_x, end_y]])
+
+
+def polygon_path(polygon):
+    """SVG path of a closed polygon, for a plotly shape."""
+    points = [f'{x},{y}' for x, y in np.asarray(polygon, dtype=float)]
+    return 'M ' + ' L '.join(points) + ' Z'
+
+
+def points_in_polygon(points, polygon):
+    """Boolean mask of the ``(n, 2)`` points inside or on the edge of ``polygon``.
+
+    Even-odd ray casting, vectorised over points and edges; only the points in
+    the polygon's bounding box are tested.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+    mask = np.zeros(len(points), dtype=bool)
+    if len(polygon) < 3 or not len(points):
+        return mask
+
+    lo, hi = polygon.min(axis=0), polygon.max(axis=0)
+    candidates = np.flatnonzero(((points >= lo) & (points <= hi)).all(axis=1) & np.isfinite(points).all(axis=1))
+    x = points[candidates, :1]  # (k, 1) against the (m,) edges
+    y = points[candidates, 1:]
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        straddles = (y0 > y) != (y1 > y)
+        crossing_x = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        inside = (straddles & (x < crossing_x)).sum(axis=1) % 2 == 1
+
+    # Points on an edge count as inside, as the inclusive bounds of the original brush did
+    cross = (x1 - x0) * (y - y0) - (y1 - y0) * (x - x0)
+    on_edge = (
+        np.isclose(cross, 0, atol=1e-9)
+        & (x >= np.minimum(x0, x1)) & (x <= np.maximum(x0, x1))
+        & (y >= np.minimum(y0, y1)) & (y <= np.maximum(y0, y1))
+    ).any(axis=1)
+    mask[candidates] = inside | on_edge
+    return mask
+
+
+def select_promising(young, polygon):
+    """Players inside the brush ``polygon``, best potential/age ratio first."""
+    with stage('scatterplot.brush') as record:
+        inside = points_in_polygon(young[['age', 'potential']].to_numpy(dtype=float), polygon)
+        promising_players = young[inside].copy()
+        promising_players['potential_age_ratio'] = promising_players['potential'] / promising_players['age']
+        promising_sorted = promising_players.sort_values(by='potential_age_ratio', ascending=False)
+        record.output(promising_sorted)
+    return promising_sorted
+
+
+def scatter_figure(young, reg, polygon):
+    """Age vs potential of the young players with the trend line and the brush."""
+    x_range = np.linspace(young['age'].min(), young['age'].max(), 100)
+    y_pred = reg.predict(x_range.reshape(-1, 1))
+
+    fig = go.Figure()
+
+    # All players
+    fig.add_trace(go.Scatter(
+        x=young['age'],
+        y=young['potential'],
+        mode='markers',
+        marker=dict(color=young['color'], size=10, line=dict(color='black', width=1)),
+        text=young['player_name'],
+        customdata=young['player_api_id'],
+        hovertemplate='<b>%{text}</b><br>Age: %{x:.2f}<br>Potential: %{y}<extra></extra>'
+    ))
+
+    # Regression trend line
+    fig.add_trace(go.Scatter(
+        x=x_range,
+        y=y_pred,
+        mode='lines',
+        line=dict(color='black', dash='dot'),
+        name='Trend Line'
+    ))
+
+    # Green polygon brush
+    fig.add_shape(
+        type='path',
+        path=polygon_path(polygon),
+        fillcolor='rgba(0,128,0,0.1)',
+        line=dict(color='green'),
+        layer='below'
+    )
+
+    # Layout
+    fig.update_layout(
+        title='Promising Players (Age as of Jan 1, 2017)',
+        xaxis_title='Age',
+        yaxis_title='Potential Rating',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=False),
+        showlegend=False,
+        dragmode='lasso'
+    )
+    return fig
+
+
+def write_promising(promising_sorted, fig):
+    with stage('scatterplot.write'):
+        with open(PROMISING_NAMES, "w") as f:
+            for name in promising_sorted['player_name']:
+                f.write(name + "\n")
+        # Ids are what heatmap.py selects by; names can be shared by several players
+        with open(PROMISING_IDS, "w") as f:
+            for player_id in promising_sorted['player_api_id']:
+                f.write(f"{player_id}\n")
+
+        save_figure(fig, FIGURE_PATH)
+
+
+def main():
+    young = load_young_players()
+    reg = fit_trend(young)
+    polygon = default_brush(reg)
+    promising_sorted = select_promising(young, polygon)
+    fig = scatter_figure(young, reg, polygon)
+    fig.show()
+    write_promising(promising_sorted, fig)
+
+    print("Top Promising Players Inside Brush (Age as of Jan 1, 2017):")
+    print(promising_sorted[['player_name', 'age', 'potential', 'potential_age_ratio']])
+
+
+if __name__ == '__main__':
+    configure_logging()
+    main()
@@ -0,0 +1,244 @@
+"""Binned shot and goal density grids per team and season.
+
+``Match_Shots_On``, ``Match_Shots_Off`` and ``Match_Goals`` carry the pitch
+position of every event (``pos_y`` along the 70-unit length, ``pos_x`` across
+the 46-unit width). Events are mirrored so every team attacks towards
+``pos_y = 70`` and counted with one ``np.bincount`` over the flattened
+(team, season, kind, across, along) index into a uint16 array, which is saved
+as .npy files and memory-mapped on load. Drawing a map is then a slice and a
+sum over seasons instead of re-binning ~190k events.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from data_store import CACHE_DIRNAME, DATA_DIR, csv_path, load_table, source_hashes
+
+MAPS_DIRNAME = "shot_maps"
+EVENT_TABLES = {
+    "shots_on": "Match_Shots_On",
+    "shots_off": "Match_Shots_Off",
+    "goals": "Match_Goals",
+}
+KINDS = list(EVENT_TABLES)
+# Own goals are recorded at the defender's position
+OWN_GOAL = "o"
+UNKNOWN_SEASON = "unknown"
+
+PITCH_LENGTH = 70
+PITCH_WIDTH = 46
+BIN_SIZE = 2
+# Only the attacking half is stored, as every event is mirrored towards pos_y = 70
+ALONG_EDGES = np.arange(PITCH_LENGTH // 2 - 1, PITCH_LENGTH + 1, BIN_SIZE)
+ACROSS_EDGES = np.arange(0, PITCH_WIDTH + 1, BIN_SIZE)
+PITCH_IMAGE = "/assets/soccer_pitch.png"
+
+
+def attacking_positions(pos_x, pos_y):
+    """(across, along) pitch positions mirrored so that every shot goes towards pos_y = 70."""
+    pos_x = np.asarray(pos_x, dtype=float)
+    pos_y = np.asarray(pos_y, dtype=float)
+    own_half = pos_y < PITCH_LENGTH / 2
+    return np.where(own_half, PITCH_WIDTH - pos_x, pos_x), np.where(own_half, PITCH_LENGTH - pos_y, pos_y)
+
+
+def bin_index(values, edges):
+    """Bin of each value in ``edges`` (clipped to the outer bins), like ``np.histogram``."""
+    return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+
+
+class ShotMaps:
+    """``counts[team, season, kind, across, along]`` event counts plus the labels of each axis.
+
+    ``matches[team, season]`` is the number of matches with event data the
+    team played, to turn counts into per-match densities.
+    """
+
+    def __init__(self, counts, matches, team_ids, seasons, kinds=KINDS):
+        self.counts = counts
+        self.matches = matches
+        self.team_ids = np.asarray(team_ids, dtype="int64")
+        self.seasons = list(seasons)
+        self.kinds = list(kinds)
+        self.sources = {}
+
+    def teams(self):
+        """Team ids with at least one binned event."""
+        return self.team_ids[np.asarray(self.counts).reshape(len(self.team_ids), -1).any(axis=1)].tolist()
+
+    def season_positions(self, seasons=None):
+        if not seasons:
+            return np.arange(len(self.seasons))
+        return np.array([self.seasons.index(season) for season in seasons if season in self.seasons], dtype="int64")
+
+    def grid(self, team_id, seasons=None, kind="shots", per_match=False):
+        """(across, along) grid of one team over ``seasons`` (all when empty).
+
+        ``kind`` is one of ``KINDS`` or ``"shots"`` for on and off target together.
+        """
+        t = np.searchsorted(self.team_ids, team_id) if team_id is not None else len(self.team_ids)
+        if t >= len(self.team_ids) or self.team_ids[t] != team_id:
+            raise ValueError(f"No shot data for team {team_id}")
+        kinds = ["shots_on", "shots_off"] if kind == "shots" else [kind]
+        k = [self.kinds.index(name) for name in kinds]
+        s = self.season_positions(seasons)
+        grid = np.asarray(self.counts[t][s][:, k]).sum(axis=(0, 1), dtype="float64")
+        if per_match:
+            matches = int(np.asarray(self.matches[t, s]).sum())
+            grid = grid / matches if matches else grid * np.nan
+        return grid
+
+    def save(self, path, sources=None):
+        # Replace files rather than overwrite them, so live memory maps stay valid
+        os.makedirs(path, exist_ok=True)
+        arrays = {"counts": self.counts, "matches": self.matches, "team_ids": self.team_ids}
+        for name, array in arrays.items():
+            tmp = os.path.join(path, f"{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+        meta = {"seasons": self.seasons, "kinds": self.kinds, "sources": sources or {}}
+        tmp = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        maps = cls(
+            np.load(os.path.join(path, "counts.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "matches.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "team_ids.npy")),
+            meta["seasons"],
+            meta["kinds"],
+        )
+        maps.sources = meta["sources"]
+        return maps
+
+
+def build_shot_maps(events, match_seasons):
+    """Bin the ``events`` (kind -> frame of match_id, team, pos_x, pos_y) into ShotMaps.
+
+    ``match_seasons`` maps ``match_id`` to its season; events of other matches
+    are binned under ``UNKNOWN_SEASON``.
+    """
+    parts = {column: [] for column in ("match_id", "team", "kind", "pos_x", "pos_y")}
+    for k, name in enumerate(KINDS):
+        df = events[name].dropna(subset=["match_id", "team"])
+        if "goal_type" in df:
+            df = df[(df["goal_type"] != OWN_GOAL).to_numpy(dtype=bool, na_value=True)]
+        parts["match_id"].append(df["match_id"].to_numpy(dtype="int64"))
+        parts["team"].append(df["team"].to_numpy(dtype="int64"))
+        parts["kind"].append(np.full(len(df), k, dtype="int64"))
+        parts["pos_x"].append(df["pos_x"].to_numpy(dtype="float64", na_value=np.nan))
+        parts["pos_y"].append(df["pos_y"].to_numpy(dtype="float64", na_value=np.nan))
+    match_id, team, kind, pos_x, pos_y = (np.concatenate(parts[column]) for column in parts)
+
+    # Season code per event: one lookup per match, then a binary search per event
+    match_ids = match_seasons.index.to_numpy(dtype="int64")
+    labels = match_seasons.astype(str).to_numpy()
+    seasons = sorted(set(labels))
+    order = np.argsort(match_ids)
+    match_ids, codes = match_ids[order], pd.Index(seasons).get_indexer(labels[order])
+    s = np.full(len(match_id), len(seasons))
+    if len(match_ids):
+        found = np.searchsorted(match_ids, match_id).clip(max=len(match_ids) - 1)
+        known = match_ids[found] == match_id
+        s[known] = codes[found[known]]
+    if (s == len(seasons)).any():
+        seasons.append(UNKNOWN_SEASON)
+
+    team_ids = np.unique(team)
+    t = np.searchsorted(team_ids, team)
+    n_teams, n_seasons = len(team_ids), len(seasons)
+
+    # Matches with event data per (team, season), positioned or not
+    cell = t * n_seasons + s
+    played = pd.unique(cell * (match_id.max(initial=0) + 1) + match_id) // (match_id.max(initial=0) + 1)
+    matches = np.bincount(played, minlength=n_teams * n_seasons).astype("int32")
+
+    # Only events with a position are binned
+    located = ~(np.isnan(pos_x) | np.isnan(pos_y))
+    across, along = attacking_positions(pos_x[located], pos_y[located])
+    n_across, n_along = len(ACROSS_EDGES) - 1, len(ALONG_EDGES) - 1
+    shape = (n_teams, n_seasons, len(KINDS), n_across, n_along)
+    flat = np.ravel_multi_index(
+        (t[located], s[located], kind[located],
+         bin_index(across, ACROSS_EDGES), bin_index(along, ALONG_EDGES)),
+        shape,
+    )
+    counts = np.bincount(flat, minlength=int(np.prod(shape)))
+    dtype = "uint16" if counts.max(initial=0) <= np.iinfo("uint16").max else "uint32"
+    return ShotMaps(counts.astype(dtype).reshape(shape), matches.reshape(n_teams, n_seasons), team_ids, seasons)
+
+
+def maps_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, CACHE_DIRNAME, MAPS_DIRNAME)
+
+
+def load_shot_maps(data_dir=DATA_DIR):
+    """Memory-mapped ShotMaps, rebuilt when an event table (or Match.csv) changed.
+
+    Without Match.csv every event is binned under ``UNKNOWN_SEASON``.
+    """
+    sources = list(EVENT_TABLES.values())
+    if os.path.exists(csv_path("Match", data_dir)):
+        sources.append("Match")
+    path = maps_path(data_dir)
+    hashes = source_hashes(sources, data_dir)
+    try:
+        maps = ShotMaps.load(path)
+        if maps.sources == hashes:
+            return maps
+    except (OSError, ValueError, KeyError):
+        pass
+
+    columns = ["match_id", "team", "pos_x", "pos_y"]
+    events = {
+        kind: load_table(table, columns=columns + (["goal_type"] if kind == "goals" else []), data_dir=data_dir)
+        for kind, table in EVENT_TABLES.items()
+    }
+    if "Match" in sources:
+        match_seasons = load_table("Match", columns=["id", "season"], data_dir=data_dir).set_index("id")["season"]
+    else:
+        match_seasons = pd.Series(dtype=object)
+    build_shot_maps(events, match_seasons).save(path, hashes)
+    return ShotMaps.load(path)
+
+
+def shot_map_figure(grid, title="", per_match=False):
+    """Density ``grid`` (from ``ShotMaps.grid``) over the pitch image, attacking to the right."""
+    z = np.where(grid > 0, grid, np.nan)  # empty cells stay transparent over the pitch
+    fig = go.Figure(go.Heatmap(
+        z=np.round(z, 3),
+        x=(ALONG_EDGES[:-1] + ALONG_EDGES[1:]) / 2,
+        y=(ACROSS_EDGES[:-1] + ACROSS_EDGES[1:]) / 2,
+        colorscale="YlOrRd",
+        opacity=0.75,
+        zmin=0,
+        colorbar=dict(title="Per match" if per_match else "Count"),
+        hovertemplate="Along: %{x}<br>Across: %{y}<br>Value: %{z}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=title,
+        images=[dict(source=PITCH_IMAGE, xref="x", yref="y", x=0, y=PITCH_WIDTH, sizex=PITCH_LENGTH,
+                     sizey=PITCH_WIDTH, sizing="stretch", layer="below")],
+        xaxis=dict(range=[0, PITCH_LENGTH], showgrid=False, zeroline=False, visible=False),
+        yaxis=dict(range=[0, PITCH_WIDTH], showgrid=False, zeroline=False, visible=False,
+                   scaleanchor="x", scaleratio=1),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        height=600,
+        margin=dict(l=20, r=20, t=50, b=20),
+    )
+    return fig
+
+
+if __name__ == "__main__":
+    maps = load_shot_maps()
+    print(f"{maps.counts.shape} {maps.counts.dtype} shot maps at {maps_path()}")
@@ -0,0 +1,159 @@
+"""Nearest-neighbour player search over the heatmap attributes of each position.
+
+For every position (``heatmap.POSITION_ATTRIBUTES``) the latest attributes
+of the players with that modal role are z-scored into a float32 matrix and
+indexed with a KD-tree, so "players like X" is a tree query instead of a
+scan over every player. Each index is saved under ``data/.cache/similarity``
+and rebuilt only when the tables it was built from change. Without
+Player_Attributes.csv or Match.csv the index covers the grouped players.
+"""
+import hashlib
+import os
+import pickle
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from data_store import CACHE_DIRNAME, DATA_DIR, source_hashes
+from heatmap import GROUPED_DIR, POSITION_ATTRIBUTES
+
+INDEX_DIRNAME = "similarity"
+SOURCES = ["Player_Attributes", "Match", "PositionReference"]
+
+
+class SimilarityIndex:
+    """KD-tree over the normalised ``attributes`` of one position's players."""
+
+    def __init__(self, position, player_ids, values, attributes=None):
+        self.position = position
+        self.attributes = list(attributes or POSITION_ATTRIBUTES[position])
+        order = np.argsort(player_ids, kind="stable")
+        self.player_ids = np.asarray(player_ids, dtype="int64")[order]
+        self.values = np.asarray(values, dtype="float32")[order]
+        self.mean = np.nanmean(self.values, axis=0) if len(self.values) else np.zeros(len(self.attributes))
+        std = np.nanstd(self.values, axis=0) if len(self.values) else np.ones(len(self.attributes))
+        self.std = np.where(std > 0, std, 1)
+        # Missing attributes sit at the position average
+        self.matrix = np.nan_to_num((self.values - self.mean) / self.std).astype("float32")
+        self.tree = KDTree(self.matrix)
+        self.sources = {}
+
+    @classmethod
+    def from_frame(cls, position, df):
+        """Index over a frame of ``player_api_id`` plus the position's attribute columns."""
+        df = df.drop_duplicates("player_api_id")
+        return cls(position, df["player_api_id"].to_numpy(), df[POSITION_ATTRIBUTES[position]].to_numpy(dtype="float32"))
+
+    def __len__(self):
+        return len(self.player_ids)
+
+    def __contains__(self, player_id):
+        i = np.searchsorted(self.player_ids, player_id)
+        return i < len(self.player_ids) and self.player_ids[i] == player_id
+
+    def query(self, vector, k=10):
+        """``(player_ids, distances)`` of the ``k`` players closest to a raw attribute vector."""
+        point = np.nan_to_num((np.asarray(vector, dtype="float32") - self.mean) / self.std)[None, :]
+        distances, rows = self.tree.query(point, k=min(k, len(self)))
+        return self.player_ids[rows[0]], distances[0]
+
+    def similar(self, player_id, k=10):
+        """The ``k`` players closest to ``player_id`` (itself excluded), nearest first.
+
+        Columns are ``player_api_id``, ``distance`` and the raw attributes.
+        """
+        if player_id not in self:
+            raise KeyError(player_id)
+        row = np.searchsorted(self.player_ids, player_id)
+        distances, rows = self.tree.query(self.matrix[row:row + 1], k=min(k + 1, len(self)))
+        rows, distances = rows[0], distances[0]
+        keep = self.player_ids[rows] != player_id
+        rows, distances = rows[keep][:k], distances[keep][:k]
+        result = pd.DataFrame(self.values[rows], columns=self.attributes)
+        result.insert(0, "distance", distances.round(3))
+        result.insert(0, "player_api_id", self.player_ids[rows])
+        return result
+
+    def save(self, path, sources=None):
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, f"{self.position}.{os.getpid()}.tmp.pkl")
+        with open(tmp, "wb") as f:
+            pickle.dump({"index": self, "sources": sources or {}}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(path, f"{self.position}.pkl"))
+
+    @classmethod
+    def load(cls, path, position):
+        with open(os.path.join(path, f"{position}.pkl"), "rb") as f:
+            saved = pickle.load(f)
+        index = saved["index"]
+        index.sources = saved["sources"]
+        return index
+
+
+def index_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, CACHE_DIRNAME, INDEX_DIRNAME)
+
+
+def position_players(data_dir=DATA_DIR):
+    """Latest attributes of every player, split by modal role into the heatmap positions."""
+    from player_index import player_roles
+    from snapshots import latest_attributes
+
+    roles = player_roles(data_dir)
+    atts = latest_attributes(data_dir=data_dir).join(roles["role"], on="player_api_id")
+    return {position: atts[(atts["role"] == position.upper()).to_numpy(dtype=bool, na_value=False)]
+            for position in POSITION_ATTRIBUTES}
+
+
+def _grouped_sources(position):
+    with open(os.path.join(GROUPED_DIR, f"{position}_players.csv"), "rb") as f:
+        return {"grouped": hashlib.sha256(f.read()).hexdigest()}
+
+
+def grouped_position_players():
+    """The grouped players of each position, as the heatmaps show them."""
+    from snapshots import latest_snapshots
+
+    return {
+        position: latest_snapshots(pd.read_csv(os.path.join(GROUPED_DIR, f"{position}_players.csv")))
+        for position in POSITION_ATTRIBUTES
+    }
+
+
+def load_indexes(data_dir=DATA_DIR):
+    """SimilarityIndex per position, rebuilding only those whose source tables changed."""
+    try:
+        hashes = source_hashes(SOURCES, data_dir)
+        sources = {position: hashes for position in POSITION_ATTRIBUTES}
+        players = partial(position_players, data_dir)
+    except FileNotFoundError:
+        sources = {position: _grouped_sources(position) for position in POSITION_ATTRIBUTES}
+        players = grouped_position_players
+
+    path = index_path(data_dir)
+    indexes, stale = {}, []
+    for position in POSITION_ATTRIBUTES:
+        try:
+            index = SimilarityIndex.load(path, position)
+            if index.sources == sources[position]:
+                indexes[position] = index
+                continue
+        except (OSError, pickle.UnpicklingError, KeyError, AttributeError, EOFError):
+            pass
+        stale.append(position)
+
+    if stale:
+        frames = players()
+        for position in stale:
+            index = SimilarityIndex.from_frame(position, frames[position])
+            index.save(path, sources[position])
+            index.sources = sources[position]
+            indexes[position] = index
+    return indexes
+
+
+if __name__ == "__main__":
+    for position, index in load_indexes().items():
+        print(f"{position}: {len(index)} players x {len(index.attributes)} attributes")
@@ -0,0 +1,103 @@
+"""Dated Player_Attributes snapshots: latest row per player and as-of lookups.
+
+Player_Attributes holds one row per player per FIFA update. Both the
+scatterplot and the heatmaps only need the most recent one, which is built
+with a single sort and persisted next to the other cached tables.
+"""
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR, load_derived, load_table
+
+LATEST_TABLE = "Player_Attributes_latest"
+
+
+def _sorted_order(player_ids, dates):
+    # One sort by (player, date); NaT dates sort first so they never win "latest"
+    date_keys = dates.astype("datetime64[ns]").astype("int64")
+    return np.lexsort((date_keys, player_ids))
+
+
+def latest_snapshots(df, id_col="player_api_id", date_col="date"):
+    """Most recent row of ``df`` per ``id_col`` (ties keep the later row)."""
+    if df.empty:
+        return df.copy()
+    ids = df[id_col].to_numpy()
+    dates = pd.to_datetime(df[date_col]).to_numpy()
+    order = _sorted_order(ids, dates)
+    sorted_ids = ids[order]
+    is_last = np.append(sorted_ids[1:] != sorted_ids[:-1], True)
+    return df.iloc[order[is_last]].reset_index(drop=True)
+
+
+def latest_attributes(columns=None, data_dir=DATA_DIR):
+    """Latest Player_Attributes row per player, rebuilt when the CSV changes."""
+    return load_derived(
+        LATEST_TABLE,
+        ["Player_Attributes"],
+        lambda: latest_snapshots(load_table("Player_Attributes", data_dir=data_dir)),
+        columns=columns,
+        data_dir=data_dir,
+    )
+
+
+class AttributeHistory:
+    """Sorted attribute history answering "attributes of player X at date D"."""
+
+    def __init__(self, player_atts):
+        ids = player_atts["player_api_id"].to_numpy()
+        dates = pd.to_datetime(player_atts["date"]).to_numpy()
+        order = _sorted_order(ids, dates)
+        self.frame = player_atts.iloc[order].reset_index(drop=True)
+        self._ids = ids[order]
+        self._dates = dates[order]
+
+    @classmethod
+    def load(cls, columns=None, data_dir=DATA_DIR):
+        if columns is not None:
+            columns = list(dict.fromkeys(["player_api_id", "date"] + list(columns)))
+        return cls(load_table("Player_Attributes", columns=columns, data_dir=data_dir))
+
+    def _span(self, player_api_id):
+        lo = np.searchsorted(self._ids, player_api_id, side="left")
+        hi = np.searchsorted(self._ids, player_api_id, side="right")
+        return lo, hi
+
+    def history(self, player_api_id):
+        """All snapshots of one player, oldest first."""
+        lo, hi = self._span(player_api_id)
+        return self.frame.iloc[lo:hi]
+
+    def as_of(self, player_api_id, date):
+        """The player's latest snapshot on or before ``date``, or None."""
+        lo, hi = self._span(player_api_id)
+        pos = lo + np.searchsorted(self._dates[lo:hi], np.datetime64(pd.Timestamp(date)), side="right") - 1
+        if pos < lo:
+            return None
+        return self.frame.iloc[pos]
+
+    def as_of_many(self, player_ids, dates):
+        """Vectorized ``as_of`` for aligned arrays of player ids and dates.
+
+        Rows come back in query order; ``date`` is the queried date and the
+        attribute columns are NaN where the player has no earlier snapshot.
+        """
+        query = pd.DataFrame({
+            "player_api_id": np.asarray(player_ids, dtype=self._ids.dtype),
+            "date": pd.to_datetime(np.asarray(dates)),
+            "_order": np.arange(len(player_ids)),
+        }).sort_values("date")
+        found = pd.merge_asof(
+            query,
+            self.frame.dropna(subset=["date"]).sort_values("date"),
+            on="date",
+            by="player_api_id",
+            suffixes=("_query", ""),
+        )
+        return found.sort_values("_order").drop(columns="_order").reset_index(drop=True)
+
+    def latest(self):
+        if not len(self._ids):
+            return self.frame.copy()
+        is_last = np.append(self._ids[1:] != self._ids[:-1], True)
+        return self.frame[is_last].reset_index(drop=True)
@@ -0,0 +1,54 @@
+"""Swarm (beeswarm) x-positions for strip plots drawn with go.Scatter.
+
+Points are placed in order of increasing y, each in the free slot nearest the
+centre (0, then one ``spread`` right, one left, two right, ...) among the
+slots of the already placed points within ``size`` of its y value. The sort,
+the window of neighbours of every point (one ``searchsorted``) and the slot
+offsets are NumPy; only the slot assignment is a Python loop, as each point's
+slot depends on the ones taken before it. A slot is freed when its point
+falls out of the window and free slots are kept in a heap, so the layout is
+O(n log n) and no two points within ``size`` of each other share an x.
+"""
+import heapq
+
+import numpy as np
+
+
+def swarm_x(y_vals, center_x, spread=0.01, size=10, max_width=0.45):
+    """x-positions (aligned with ``y_vals``) that separate overlapping points.
+
+    When a crowded window would push points further than ``max_width`` from
+    ``center_x`` (into the next column), ``spread`` is scaled down to fit.
+    """
+    y = np.asarray(y_vals, dtype="float64")
+    x = np.full(len(y), float(center_x))
+    valid = ~np.isnan(y)
+    if not valid.any():
+        return x
+
+    idx = np.flatnonzero(valid)
+    order = idx[np.argsort(y[idx], kind="stable")]
+    y_sorted = y[order]
+
+    # Window of point i: the earlier sorted points with y > y_i - size
+    window_start = np.searchsorted(y_sorted, y_sorted - size, side="right").tolist()
+    slots = []
+    free, next_slot, released = [], 0, 0
+    for start in window_start:
+        for j in range(released, start):
+            heapq.heappush(free, slots[j])
+        released = max(released, start)
+        if free:
+            slots.append(heapq.heappop(free))
+        else:
+            slots.append(next_slot)
+            next_slot += 1
+
+    # Slot 0, 1, 2, 3, 4, ... sits at offset 0, +1, -1, +2, -2, ...
+    slots = np.array(slots)
+    offset = (slots + 1) // 2 * np.where(slots % 2 == 1, 1.0, -1.0)
+    widest = np.abs(offset).max()
+    if widest * spread > max_width:
+        spread = max_width / widest
+    x[order] = center_x + spread * offset
+    return x
@@ -0,0 +1,268 @@
+"""Dense team x season x metric cube of team statistics.
+
+Results, possession, event counts and Team_Attributes are folded into one
+float32 array with integer-coded team and season axes, saved as .npy files
+that are memory-mapped on load. Queries such as "all teams in league L,
+season S, metrics M" are then index lookups instead of groupby/merge chains.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import CACHE_DIRNAME, DATA_DIR, load_table, source_hashes
+from events import EVENT_TABLES, KEYS, covered_counts, event_counts
+from results import team_matches
+
+CUBE_DIRNAME = "team_cube"
+SOURCES = ["Match", "Match_Possesion", "Team_Attributes"] + list(EVENT_TABLES.values())
+
+RESULT_METRICS = ["points", "goals_for", "goals_against", "goal_diff"]
+EVENT_METRICS = list(EVENT_TABLES)
+ATTRIBUTE_METRICS = [
+    "buildUpPlaySpeed",
+    "buildUpPlayDribbling",
+    "buildUpPlayPassing",
+    "chanceCreationPassing",
+    "chanceCreationCrossing",
+    "chanceCreationShooting",
+    "defencePressure",
+    "defenceAggression",
+    "defenceTeamWidth",
+]
+# Event types are counted over the matches their own table covers
+COUNT_METRICS = ["matches", "possession_matches"] + [f"{metric}_matches" for metric in EVENT_METRICS]
+METRICS = COUNT_METRICS + RESULT_METRICS + ["possession"] + EVENT_METRICS + ATTRIBUTE_METRICS
+
+# Match count each per-match average is taken over, used to combine seasons
+WEIGHTS = {
+    **{metric: "matches" for metric in RESULT_METRICS},
+    "possession": "possession_matches",
+    **{metric: f"{metric}_matches" for metric in EVENT_METRICS},
+}
+
+
+def season_end(season):
+    """Last day of a 'YYYY/YYYY' season."""
+    return pd.Timestamp(f"{season[-4:]}-06-30")
+
+
+class TeamCube:
+    """``values[team, season, metric]`` plus the labels of each axis.
+
+    ``leagues[team, season]`` is the league the team played in that season
+    (0 when it played no matches).
+    """
+
+    def __init__(self, values, leagues, team_ids, seasons, metrics):
+        self.values = values
+        self.leagues = leagues
+        self.team_ids = np.asarray(team_ids, dtype="int64")
+        self.seasons = list(seasons)
+        self.metrics = list(metrics)
+        self._season_pos = {season: i for i, season in enumerate(self.seasons)}
+        self._metric_pos = {metric: i for i, metric in enumerate(self.metrics)}
+
+    def team_positions(self, team_ids):
+        team_ids = np.atleast_1d(np.asarray(team_ids, dtype="int64"))
+        pos = np.searchsorted(self.team_ids, team_ids)
+        found = (pos < len(self.team_ids)) & (self.team_ids[np.minimum(pos, len(self.team_ids) - 1)] == team_ids)
+        if not found.all():
+            raise KeyError(f"Unknown teams: {team_ids[~found].tolist()}")
+        return pos
+
+    def season_positions(self, seasons):
+        try:
+            return np.array([self._season_pos[season] for season in seasons], dtype="int64")
+        except KeyError as e:
+            raise KeyError(f"Unknown season: {e.args[0]}") from None
+
+    def metric_positions(self, metrics):
+        try:
+            return np.array([self._metric_pos[metric] for metric in metrics], dtype="int64")
+        except KeyError as e:
+            raise KeyError(f"Unknown metric: {e.args[0]}") from None
+
+    def slice(self, league=None, seasons=None, metrics=None, teams=None):
+        """Sub-cube and its labels: ``(values, team_ids, seasons, metrics)``.
+
+        With ``league``, only teams that played in it in one of ``seasons``
+        are kept.
+        """
+        seasons = self.seasons if seasons is None else [seasons] if isinstance(seasons, str) else list(seasons)
+        metrics = self.metrics if metrics is None else list(metrics)
+        s = self.season_positions(seasons)
+        m = self.metric_positions(metrics)
+        t = np.arange(len(self.team_ids)) if teams is None else self.team_positions(teams)
+        if league is not None:
+            t = t[(self.leagues[np.ix_(t, s)] == league).any(axis=1)]
+        return self.values[np.ix_(t, s, m)], self.team_ids[t], seasons, metrics
+
+    def frame(self, season, league=None, metrics=None, teams=None):
+        """Teams x metrics DataFrame for one season."""
+        values, team_ids, _, metrics = self.slice(league, [season], metrics, teams)
+        return pd.DataFrame(values[:, 0, :], index=pd.Index(team_ids, name="team_api_id"), columns=metrics)
+
+    def aggregate(self, metrics, seasons=None, league=None, teams=None):
+        """Per-match averages over several seasons, weighted by matches played."""
+        metrics = list(metrics)
+        weights = [WEIGHTS[metric] for metric in metrics]
+        values, team_ids, _, _ = self.slice(league, seasons, metrics + weights, teams)
+        values = values.astype("float64")
+        x, w = values[:, :, :len(metrics)], values[:, :, len(metrics):]
+        valid = ~np.isnan(x) & (w > 0)
+        totals = np.where(valid, x * w, 0).sum(axis=1)
+        counts = np.where(valid, w, 0).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = np.where(counts > 0, totals / counts, np.nan)
+        return pd.DataFrame(result, index=pd.Index(team_ids, name="team_api_id"), columns=metrics)
+
+    def latest(self, metrics, seasons=None, teams=None):
+        """Most recent non-missing value of each metric per team."""
+        values, team_ids, _, metrics = self.slice(None, seasons, metrics, teams)
+        present = ~np.isnan(values)
+        last = values.shape[1] - 1 - np.argmax(present[:, ::-1, :], axis=1)
+        result = np.take_along_axis(values, last[:, None, :], axis=1)[:, 0, :]
+        result = np.where(present.any(axis=1), result, np.nan)
+        return pd.DataFrame(result, index=pd.Index(team_ids, name="team_api_id"), columns=metrics)
+
+    def save(self, path, sources=None):
+        # Replace files rather than overwrite them, so live memory maps stay valid
+        os.makedirs(path, exist_ok=True)
+        arrays = {"values": self.values, "leagues": self.leagues, "team_ids": self.team_ids}
+        for name, array in arrays.items():
+            tmp = os.path.join(path, f"{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+        meta = {"seasons": self.seasons, "metrics": self.metrics, "sources": sources or {}}
+        tmp = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        cube = cls(
+            np.load(os.path.join(path, "values.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "leagues.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "team_ids.npy")),
+            meta["seasons"],
+            meta["metrics"],
+        )
+        cube.sources = meta["sources"]
+        return cube
+
+
+def _per_cell(flat, size, weights=None):
+    return np.bincount(flat, weights=weights, minlength=size)
+
+
+def build_team_cube(matches, match_possession, events, team_attr):
+    """Fold results, possession, event counts and attributes into a TeamCube."""
+    long = team_matches(matches)
+    seasons = sorted(long["season"].astype(str).unique())
+    team_ids = np.union1d(long["team_api_id"].unique(), team_attr["team_api_id"].unique())
+    n_teams, n_seasons = len(team_ids), len(seasons)
+    size = n_teams * n_seasons
+
+    t = np.searchsorted(team_ids, long["team_api_id"].to_numpy())
+    s = np.searchsorted(np.array(seasons), long["season"].astype(str).to_numpy())
+    flat = t * n_seasons + s
+
+    values = np.full((size, len(METRICS)), np.nan, dtype="float32")
+    col = {metric: i for i, metric in enumerate(METRICS)}
+
+    def put_average(metric, weights, mask, count_metric):
+        counts = _per_cell(flat[mask], size)
+        totals = _per_cell(flat[mask], size, weights[mask])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values[:, col[metric]] = np.where(counts > 0, totals / counts, np.nan)
+        values[:, col[count_metric]] = counts
+
+    everything = np.ones(len(long), dtype=bool)
+    for metric in RESULT_METRICS:
+        put_average(metric, long[metric].to_numpy(dtype="float64"), everything, "matches")
+
+    # Possession: match average of the possession samples, from each team's side
+    pos = match_possession.groupby("match_id")[["homepos", "awaypos"]].mean()
+    pos = pos.reindex(long["match_id"].to_numpy())
+    possession = np.where(long["side"].to_numpy() == "home", pos["homepos"].to_numpy(), pos["awaypos"].to_numpy())
+    put_average("possession", possession, ~np.isnan(possession), "possession_matches")
+
+    # Events: every team of a match an event table covers counts, 0 when it had none there
+    pairs = pd.MultiIndex.from_arrays([long["match_id"].to_numpy(), long["team_api_id"].to_numpy()], names=KEYS)
+    per_match = covered_counts(events, pairs)
+    for metric in EVENT_METRICS:
+        counts = per_match[metric].to_numpy(dtype="float64")
+        put_average(metric, counts, ~np.isnan(counts), f"{metric}_matches")
+
+    values = values.reshape(n_teams, n_seasons, len(METRICS))
+    leagues = np.zeros((n_teams, n_seasons), dtype="int32")
+    if "league_id" in long:
+        leagues[t, s] = long["league_id"].to_numpy()
+
+    # Attributes as of each season's end; the last non-missing value per column wins
+    attrs = team_attr.assign(date=pd.to_datetime(team_attr["date"], errors="coerce")).dropna(subset=["date"])
+    attrs = attrs.sort_values(["team_api_id", "date"])
+    attrs[ATTRIBUTE_METRICS] = attrs.groupby("team_api_id")[ATTRIBUTE_METRICS].ffill()
+    grid = pd.DataFrame({
+        "team_api_id": np.repeat(team_ids, n_seasons),
+        "date": pd.DatetimeIndex(np.tile([season_end(season) for season in seasons], n_teams)).astype(attrs["date"].dtype),
+        "cell": np.arange(size),
+    })
+    as_of = pd.merge_asof(
+        grid.sort_values("date"),
+        attrs[["team_api_id", "date"] + ATTRIBUTE_METRICS].astype({"team_api_id": grid["team_api_id"].dtype}).sort_values("date"),
+        on="date",
+        by="team_api_id",
+    ).sort_values("cell")
+    values.reshape(size, len(METRICS))[:, [col[m] for m in ATTRIBUTE_METRICS]] = as_of[ATTRIBUTE_METRICS].to_numpy(dtype="float32")
+
+    return TeamCube(values, leagues, team_ids, seasons, METRICS)
+
+
+def cube_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, CACHE_DIRNAME, CUBE_DIRNAME)
+
+
+def load_team_cube(data_dir=DATA_DIR):
+    """Memory-mapped TeamCube, rebuilt when any of its source CSVs changed."""
+    path = cube_path(data_dir)
+    hashes = source_hashes(SOURCES, data_dir)
+    try:
+        cube = TeamCube.load(path)
+        if cube.sources == hashes and cube.metrics == METRICS:
+            return cube
+    except (OSError, ValueError, KeyError):
+        pass
+
+    matches = load_table(
+        "Match",
+        columns=[
+            "id",
+            "season",
+            "league_id",
+            "home_team_api_id",
+            "away_team_api_id",
+            "home_team_goal",
+            "away_team_goal",
+        ],
+        data_dir=data_dir,
+    )
+    cube = build_team_cube(
+        matches,
+        load_table("Match_Possesion", columns=["match_id", "homepos", "awaypos"], data_dir=data_dir),
+        event_counts(data_dir=data_dir),
+        load_table("Team_Attributes", data_dir=data_dir),
+    )
+    cube.save(path, hashes)
+    return TeamCube.load(path)
+
+
+if __name__ == "__main__":
+    cube = load_team_cube()
+    print(f"{cube.values.shape} cube at {cube_path()}")
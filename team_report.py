@@ -0,0 +1,305 @@
+"""Team analysis engine behind the bar and violin figures.
+
+``TeamAnalysis`` computes the league-wide points per (team, season,
+opponent) once and reads team attributes and possession/event metrics from
+the team cube. A report for any team is then a slice of those tables plus
+the two figure builders, so changing the team no longer means re-running
+``bar_and_violin_interactive.py``.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from data_store import load_table
+from instrumentation import instrument, stage
+from results import team_matches
+from swarm import swarm_x
+from team_cube import load_team_cube
+
+BASELINE = 1.1
+TOP_N = 5
+SEASONS = [f"{year}/{year + 1}" for year in range(2008, 2016)]
+
+SELECTED_ATTRS = [
+    "buildUpPlaySpeed",
+    "buildUpPlayDribbling",
+    "defencePressure",
+    "defenceAggression",
+    "chanceCreationPassing",
+]
+METRICS = ["possession", "shots_on", "shots_off"]
+# Metrics drawn ×10 so they share the 0-100 axis with the attributes
+SCALED_METRICS = ["shots_on", "shots_off"]
+
+CLASS_COLORS = {
+    "top": "limegreen",
+    "bottom": "crimson",
+    "others": "grey",
+    "ours": "deepskyblue",
+}
+
+
+def class_labels(top_n):
+    return {
+        "top": f"Top {top_n}",
+        "bottom": f"Bottom {top_n}",
+        "others": "Others",
+        "ours": "Our Team",
+    }
+
+
+def season_span(seasons):
+    """'2008–2016' style label for a list of 'YYYY/YYYY' seasons."""
+    seasons = sorted(seasons or SEASONS)
+    return f"{seasons[0][:4]}–{seasons[-1][-4:]}"
+
+
+class TeamAnalysis:
+    """League-wide tables computed once, sliced per team."""
+
+    def __init__(self, opponent_points, team_names, cube):
+        self.opponent_points = opponent_points
+        self.team_names = team_names
+        self.cube = cube
+
+    @classmethod
+    def from_matches(cls, matches, team, cube):
+        long = team_matches(matches)
+        opponent_points = (
+            long.groupby(["team_api_id", "season", "opponent_team_api_id"])["points"]
+            .agg(["sum", "count"])
+            .sort_index()
+        )
+        return cls(opponent_points, team.set_index("team_api_id")["team_long_name"], cube)
+
+    @classmethod
+    @instrument("TeamAnalysis.load")
+    def load(cls):
+        matches = load_table(
+            "Match",
+            columns=[
+                "id",
+                "season",
+                "home_team_api_id",
+                "away_team_api_id",
+                "home_team_goal",
+                "away_team_goal",
+            ],
+        )
+        return cls.from_matches(
+            matches,
+            load_table("Team", columns=["team_api_id", "team_long_name"]),
+            load_team_cube(),
+        )
+
+    def team_metrics(self, seasons=None):
+        """Latest attributes and per-match metric averages over ``seasons``, per team."""
+        attrs = self.cube.latest(SELECTED_ATTRS, seasons).dropna(how="all")
+        metrics = self.cube.aggregate(METRICS, seasons).dropna(subset=["possession"])
+        return attrs.join(metrics, how="inner")
+
+    def teams(self):
+        """(team_api_id, name) of every team with at least one match."""
+        ids = self.opponent_points.index.get_level_values("team_api_id").unique()
+        names = self.team_names.reindex(ids).dropna()
+        return sorted(names.items(), key=lambda item: item[1])
+
+    def team_name(self, team_id):
+        return self.team_names.get(team_id, str(team_id))
+
+    def points_vs_opponents(self, team_id, seasons=None, top_n=TOP_N):
+        """Average points of ``team_id`` against each opponent, best first."""
+        try:
+            rows = self.opponent_points.xs(team_id, level="team_api_id")
+        except KeyError:
+            raise ValueError(f"No matches for team {team_id}") from None
+        if seasons:
+            rows = rows[rows.index.get_level_values("season").isin(seasons)]
+        totals = rows.groupby(level="opponent_team_api_id").sum()
+        if totals.empty:
+            raise ValueError(f"No matches for team {team_id} in {', '.join(seasons)}")
+
+        df = (totals["sum"] / totals["count"]).rename("points").reset_index()
+        df["team_long_name"] = df["opponent_team_api_id"].map(self.team_names)
+        df = df.sort_values("points", ascending=False, kind="stable").reset_index(drop=True)
+
+        labels = class_labels(top_n)
+        n = len(df)
+        df["classification"] = [
+            labels["top"] if i < top_n else labels["bottom"] if i >= n - top_n else labels["others"]
+            for i in range(n)
+        ]
+        df["color"] = [
+            CLASS_COLORS["top"] if i < top_n else CLASS_COLORS["bottom"] if i >= n - top_n else CLASS_COLORS["others"]
+            for i in range(n)
+        ]
+        return df
+
+    def attribute_table(self, team_id, points, seasons=None):
+        """Opponents plus our team with their attributes and metrics."""
+        ours = pd.DataFrame({
+            "opponent_team_api_id": [team_id],
+            "points": [0.0],
+            "team_long_name": [self.team_name(team_id)],
+            "classification": [class_labels(0)["ours"]],
+            "color": [CLASS_COLORS["ours"]],
+        })
+        table = pd.concat([points, ours], ignore_index=True)
+        return table.merge(
+            self.team_metrics(seasons), left_on="opponent_team_api_id", right_index=True
+        )
+
+    def report(self, team_id, seasons=None, top_n=TOP_N, baseline=BASELINE):
+        """Bar and violin figures for one team."""
+        with stage("team_report.tables", team_id=team_id) as record:
+            points = self.points_vs_opponents(team_id, seasons, top_n)
+            attrs = self.attribute_table(team_id, points, seasons)
+            record.output(points, attrs)
+        name = self.team_name(team_id)
+        period = season_span(seasons)
+        with stage("team_report.figures", team_id=team_id):
+            return {
+                "bar": bar_figure(points, name, period, baseline),
+                "violin": violin_figure(attrs, name, period, top_n),
+            }
+
+
+def bar_figure(df_final, team_name, period, baseline=BASELINE):
+    # One trace per classification; bars hang from the baseline up or down
+    points = df_final["points"].to_numpy()
+    df = df_final.assign(
+        height=abs(points - baseline),
+        bottom=np.minimum(points, baseline),
+        hovertext=df_final["team_long_name"] + ": " + df_final["points"].map("{:.2f}".format) + " points",
+    )
+    fig_bar = go.Figure()
+    for classification, sub in df.groupby("classification", sort=False):
+        fig_bar.add_trace(
+            go.Bar(
+                x=sub["team_long_name"],
+                y=sub["height"],
+                base=sub["bottom"],
+                marker_color=sub["color"],
+                name=classification,
+                hoverinfo="text",
+                hovertext=sub["hovertext"],
+            )
+        )
+
+    fig_bar.update_layout(
+        title=f"{team_name}: Average Points Earned Against Opponents ({period})",
+        xaxis_title="Opponent Team",
+        yaxis_title="Average Points",
+        showlegend=False,
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        barmode="overlay",
+        xaxis_categoryorder="array",
+        xaxis_categoryarray=df["team_long_name"],
+    )
+
+    # Draw baseline
+    fig_bar.add_shape(
+        type="line",
+        x0=-0.5,
+        y0=baseline,
+        x1=len(df_final) - 0.5,
+        y1=baseline,
+        line=dict(color="black", dash="dash"),
+    )
+    return fig_bar
+
+
+def display_name(attr):
+    return f"{attr} ×10" if attr in SCALED_METRICS else attr
+
+
+def violin_figure(merged_attrs, team_name, period, top_n=TOP_N):
+    fig = go.Figure()
+    labels = class_labels(top_n)
+    attrs_all = SELECTED_ATTRS + METRICS
+    for attr_idx, attr in enumerate(attrs_all):
+        scale = 10 if attr in SCALED_METRICS else 1
+        merged_y = merged_attrs[attr] * scale
+
+        # Add violin plot
+        fig.add_trace(
+            go.Violin(
+                y=merged_y,
+                x=[attr_idx] * len(merged_attrs),
+                name=display_name(attr),
+                box_visible=False,
+                meanline_visible=True,
+                fillcolor="rgba(255,255,255,0.7)",
+                line_color="black",
+                showlegend=False,
+            )
+        )
+
+    # Simulated swarm points: one trace per classification across all attributes
+    for key in ["top", "bottom", "others", "ours"]:
+        sub = merged_attrs[merged_attrs["classification"] == labels[key]]
+        xs, ys, attr_names = [], [], []
+        for attr_idx, attr in enumerate(attrs_all):
+            sub_y = sub[attr].to_numpy() * (10 if attr in SCALED_METRICS else 1)
+            xs.append(swarm_x(sub_y, center_x=attr_idx))
+            ys.append(sub_y)
+            attr_names.append(np.full(len(sub), display_name(attr)))
+
+        fig.add_trace(
+            go.Scatter(
+                x=np.concatenate(xs),
+                y=np.concatenate(ys),
+                mode="markers",
+                marker=dict(
+                    color=CLASS_COLORS[key],
+                    size=10,
+                    opacity=0.7,
+                    line=dict(width=1, color="black"),
+                ),
+                name=labels[key],
+                text=np.tile(sub["team_long_name"].to_numpy(), len(attrs_all)),
+                customdata=np.concatenate(attr_names),
+                hovertemplate="%{text}<br>%{customdata}: %{y:.2f}",
+            )
+        )
+
+    # Final layout
+    fig.update_layout(
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        title=f"{team_name}: Attribute Distributions of league teams ({period})",
+        yaxis=dict(
+            title="Value",
+            range=[0, 100],
+            dtick=20,
+            gridcolor="lightgray",
+            gridwidth=1,
+            griddash="dash",
+        ),
+        xaxis=dict(
+            title="Attributes",
+            tickmode="array",
+            tickvals=list(range(len(attrs_all))),
+            ticktext=[display_name(attr) for attr in attrs_all],
+            tickangle=0,
+        ),
+        legend=dict(title="Classification"),
+    )
+    return fig
+
+
+_analysis = None
+
+
+def get_analysis():
+    """Shared TeamAnalysis, built on first use."""
+    global _analysis
+    if _analysis is None:
+        _analysis = TeamAnalysis.load()
+    return _analysis
+
+
+def build_team_report(team_id, seasons=None, top_n=TOP_N, baseline=BASELINE):
+    """Bar and violin figures for ``team_id`` over ``seasons`` (all when None)."""
+    return get_analysis().report(team_id, seasons, top_n, baseline)
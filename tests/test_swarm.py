@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from swarm import swarm_x
+
+
+def assert_no_collisions(y, x, size):
+    y, x = np.asarray(y, dtype=float), np.asarray(x)
+    close = np.abs(y[:, None] - y[None, :]) < size
+    same_x = np.isclose(x[:, None], x[None, :])
+    np.fill_diagonal(close, False)
+    assert not (close & same_x).any()
+
+
+def test_neighbours_within_size_get_different_x():
+    x = swarm_x([0, 9, 10], 0)
+    assert_no_collisions([0, 9, 10], x, size=10)
+    assert x[0] == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("size", [1, 10, 25])
+def test_random_points_never_share_x_within_size(seed, size):
+    rng = np.random.default_rng(seed)
+    y = rng.choice(rng.uniform(0, 100, 150), 300)  # repeated values too
+    x = swarm_x(y, center_x=3, size=size)
+    assert_no_collisions(y, x, size)
+
+
+def test_isolated_and_missing_points_stay_centred():
+    x = swarm_x([5, np.nan, 50, 95], center_x=2)
+    assert np.array_equal(x, [2, 2, 2, 2])
+
+
+def test_nearest_free_slot_alternates_right_and_left():
+    x = swarm_x([5, 5, 5, 5, 5], center_x=0, spread=1, max_width=2)
+    assert list(x) == [0, 1, -1, 2, -2]
+
+
+def test_crowded_windows_stay_within_their_column():
+    y = np.random.default_rng(0).uniform(0, 20, 500)
+    x = swarm_x(y, center_x=4)
+    assert np.abs(x - 4).max() <= 0.45 + 1e-12
+    assert_no_collisions(y, x, size=10)
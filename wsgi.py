@@ -0,0 +1,55 @@
+"""WSGI entry point for serving the app with several worker processes.
+
+    gunicorn -c gunicorn.conf.py wsgi:server
+
+With ``preload_app`` (gunicorn.conf.py) this module is imported once in the
+master before the workers are forked. Importing app.py loads the player index,
+figures and shot maps; ``preload`` then loads everything app.py otherwise
+loads on first use (brush pool, attribute history, similarity indexes,
+possession curves, ratings) and renders the default view of every tab into
+the figure cache. ``gc.freeze`` moves all of it out of the collector's reach,
+so the workers share those pages copy-on-write instead of each holding a copy.
+The cubes, maps and curves are memory-mapped and shared through the page cache
+either way.
+"""
+import gc
+import logging
+
+import app as dashboard
+from instrumentation import stage
+
+log = logging.getLogger(__name__)
+
+LAZY_LOADERS = [
+    dashboard.brush_pool,
+    dashboard.attribute_history,
+    dashboard.similarity_indexes,
+    dashboard.possession_curves,
+    dashboard.team_ratings,
+]
+
+
+def preload():
+    """Load the lazily loaded data and build the default figure of each tab."""
+    with stage("wsgi.preload") as record:
+        for loader in LAZY_LOADERS:
+            try:
+                loader()
+            except FileNotFoundError as e:  # the callbacks fall back on their own
+                log.warning("preload %s skipped: %s", loader.__name__, e)
+
+        # The callbacks with the inputs of each tab's initial layout
+        defaults = dashboard.HEATMAP_DEFAULTS
+        dashboard.update_brush(None)
+        dashboard.update_heatmaps(defaults["top_n"], defaults["min_ratio"], [], 1, None)
+        dashboard.update_team_report(dashboard.TEAM_ID, [])
+        dashboard.update_possession(dashboard.TEAM_ID, [])
+        dashboard.update_shot_map(dashboard.SHOT_TEAM_ID, [], "shots", [])
+        dashboard.update_ratings([dashboard.TEAM_ID], None)
+        record["figures"] = len(dashboard.figure_cache)
+
+
+preload()
+gc.freeze()
+
+server = application = dashboard.server